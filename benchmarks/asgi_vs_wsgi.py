@@ -0,0 +1,134 @@
+"""
+Throughput and tail latency of the task list under WSGI and ASGI.
+
+    python -m benchmarks.asgi_vs_wsgi [--requests 2000] [--concurrency 200] [--threads 32]
+
+Both handlers are driven in-process, with no network in between, so the
+numbers are about the request path itself. WSGI gets a pool of --threads
+worker threads like a threaded server (gunicorn gthread, waitress). ASGI
+runs --concurrency requests at once on one event loop with the async task
+views (todo.async_views). Every mode runs in its own process.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import setup_django, make_user, make_tasks, percentiles
+
+PATH = '/'
+
+
+def login_cookie(user):
+    from django.test import Client
+    client = Client()
+    client.force_login(user)
+    return f'sessionid={client.cookies["sessionid"].value}'
+
+
+def run_wsgi(cookie, requests, threads):
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+
+    def one(_):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': PATH, 'QUERY_STRING': '', 'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80', 'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie,
+            'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+        }
+        statuses = []
+        start = time.perf_counter()
+        body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+        assert statuses[0].startswith('200'), statuses
+        return time.perf_counter() - start, len(body)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(one, range(requests)))
+
+
+def run_asgi(cookie, requests, concurrency):
+    from django.core.asgi import get_asgi_application
+    application = get_asgi_application()
+
+    async def one():
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': PATH, 'raw_path': PATH.encode(), 'query_string': b'',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+        }
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        start = time.perf_counter()
+        await application(scope, receive, send)
+        assert sent[0]['status'] == 200, sent[0]
+        return time.perf_counter() - start, sum(len(m.get('body', b'')) for m in sent)
+
+    async def main():
+        gate = asyncio.Semaphore(concurrency)
+
+        async def limited():
+            async with gate:
+                return await one()
+        return await asyncio.gather(*[limited() for _ in range(requests)])
+
+    return asyncio.run(main())
+
+
+def run_child(mode, args):
+    teardown = setup_django()
+    try:
+        user = make_user()
+        make_tasks(user, args.tasks)
+        cookie = login_cookie(user)
+        start = time.perf_counter()
+        if mode == 'wsgi':
+            results = run_wsgi(cookie, args.requests, args.threads)
+        else:
+            results = run_asgi(cookie, args.requests, args.concurrency)
+        elapsed = time.perf_counter() - start
+        return {'mode': mode, 'requests': args.requests, 'rps': args.requests / elapsed,
+                **percentiles([latency for latency, _ in results])}
+    finally:
+        teardown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--child', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # The page cache would turn this into a cache benchmark
+        os.environ.setdefault('TODO_TASK_CACHE_TIMEOUT', '0')
+        print(json.dumps(run_child(args.child, args)))
+        return
+
+    print(f'{"mode":<6} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for mode in ['wsgi', 'asgi']:
+        env = dict(os.environ, TODO_ASYNC_VIEWS='1' if mode == 'asgi' else '0')
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.asgi_vs_wsgi', '--child', mode, *sys.argv[1:]],
+            check=True, capture_output=True, text=True, env=env,
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f'{mode:<6} {r["rps"]:>8.0f} {r["p50_ms"]:>8.1f} {r["p95_ms"]:>8.1f} {r["p99_ms"]:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Shared setup for the scripts in this folder.
+
+Each benchmark runs against a throwaway copy of the schema (the Django test
+database) so it never touches db.sqlite3. Run them from the repository
+root, e.g. `python -m benchmarks.export_memory`.
+"""
+import os
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django(db_file=None):
+    # Configure Django and create a fresh test database, returns a teardown
+    # callable. SQLite gets a file on disk unless db_file is ':memory:'.
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todoapp.settings')
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    old_name = connection.settings_dict['NAME']
+    if connection.vendor == 'sqlite':
+        if db_file is None:
+            db_file = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+        connection.settings_dict['TEST']['NAME'] = db_file
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+    def teardown():
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    return teardown
+
+
+def make_user(username='bench', password='bench-pass'):
+    from django.contrib.auth.models import User
+    return User.objects.create_user(username, password=password)
+
+
+def make_tasks(user, count, batch_size=5000):
+    # Plain bulk inserts, the search index is not needed by every benchmark
+    import datetime
+    from todo.models import Task
+    today = datetime.date.today()
+    for start in range(0, count, batch_size):
+        Task.objects.bulk_create([
+            Task(user=user, title=f'Task {i}', description='x' * (i % 200),
+                 complete=i % 3 == 0, date=today + datetime.timedelta(days=i % 90))
+            for i in range(start, min(count, start + batch_size))
+        ])
+
+
+def percentiles(latencies):
+    # Latencies in seconds to p50/p95/p99/mean in milliseconds
+    latencies = sorted(latencies)
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99),
+            'mean_ms': statistics.fmean(latencies) * 1000}
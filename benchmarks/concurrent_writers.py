@@ -0,0 +1,121 @@
+"""
+SQLite under concurrent writers: Django's defaults against todoapp.db.
+
+    python -m benchmarks.concurrent_writers [--writers 8] [--readers 8] [--seconds 10]
+
+Writer threads load and save a task through the ORM in one transaction
+(the taskupdate path, with the search index and cache signals), reader
+threads load the first page of the task list query. The "default" profile is what Django does out
+of the box: rollback journal, synchronous=FULL, DEFERRED transactions and
+a 5 second busy timeout. Each profile runs in its own process.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from .common import setup_django, make_user, make_tasks
+
+PROFILES = {
+    'default': {
+        'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_MMAP_SIZE': '0',
+        'SQLITE_CACHE_SIZE': '-2000', 'SQLITE_TEMP_STORE': 'DEFAULT',
+        'SQLITE_TRANSACTION_MODE': '', 'SQLITE_BUSY_TIMEOUT': '5',
+    },
+    'tuned': {},
+}
+
+
+def run_child(args):
+    teardown = setup_django()
+    try:
+        from django.db import connection, transaction, OperationalError
+        from todo.models import Task
+        from todo.views import task_page_query
+
+        user = make_user()
+        make_tasks(user, 2000)
+        connection.close()
+        stop = time.monotonic() + args.seconds
+        counts = {'writes': 0, 'reads': 0, 'locked': 0, 'write_latency': [], 'read_latency': []}
+        lock = threading.Lock()
+
+        def work(kind):
+            while time.monotonic() < stop:
+                start = time.perf_counter()
+                try:
+                    if kind == 'writes':
+                        # Read then write, like taskupdate: a DEFERRED
+                        # transaction has to upgrade its lock halfway
+                        with transaction.atomic():
+                            task = Task.objects.filter(user=user).order_by('?').first()
+                            task.title = 'concurrent write'
+                            task.save()
+                    else:
+                        tasks, ordering = task_page_query(Task.objects.filter(user=user), '')
+                        list(tasks.order_by(*ordering)[:50])
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    with lock:
+                        counts['locked'] += 1
+                    continue
+                elapsed = time.perf_counter() - start
+                with lock:
+                    counts[kind] += 1
+                    counts[kind[:-1] + '_latency'].append(elapsed)
+            connection.close()
+
+        threads = [threading.Thread(target=work, args=('writes',)) for _ in range(args.writers)]
+        threads += [threading.Thread(target=work, args=('reads',)) for _ in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        def p99(values):
+            return sorted(values)[int(0.99 * (len(values) - 1))] * 1000 if values else 0
+
+        journal = connection.cursor().execute('PRAGMA journal_mode').fetchone()[0]
+        return {
+            'journal_mode': journal,
+            'writes_per_s': counts['writes'] / args.seconds,
+            'reads_per_s': counts['reads'] / args.seconds,
+            'locked_errors': counts['locked'],
+            'write_p99_ms': p99(counts['write_latency']),
+            'read_p99_ms': p99(counts['read_latency']),
+        }
+    finally:
+        teardown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args)))
+        return
+
+    print(f'{"profile":<8} {"journal":>8} {"writes/s":>9} {"reads/s":>8} {"locked":>7} {"write p99":>10} {"read p99":>9}')
+    for name, overrides in PROFILES.items():
+        env = dict(os.environ, **overrides)
+        env.pop('DATABASE_URL', None)
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.concurrent_writers', '--child', *sys.argv[1:]],
+            check=True, capture_output=True, text=True, env=env,
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f'{name:<8} {r["journal_mode"]:>8} {r["writes_per_s"]:>9.0f} {r["reads_per_s"]:>8.0f} '
+              f'{r["locked_errors"]:>7} {r["write_p99_ms"]:>8.1f}ms {r["read_p99_ms"]:>7.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
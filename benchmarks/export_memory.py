@@ -0,0 +1,71 @@
+"""
+Peak memory of the streaming task export against the number of tasks.
+
+    python -m benchmarks.export_memory [--sizes 100 10000 1000000] [--format csv]
+
+Every size runs in its own process, so ru_maxrss is that run's own peak.
+The export view streams rows from a database cursor, the peak should stay
+flat while the task count grows.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from .common import setup_django, make_user, make_tasks
+
+
+def run_one(size, export_format):
+    teardown = setup_django()
+    try:
+        from django.test import Client
+        user = make_user()
+        make_tasks(user, size)
+        client = Client()
+        client.force_login(user)
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        start = time.perf_counter()
+        response = client.get('/export_tasks', {'format': export_format})
+        written = sum(len(chunk) for chunk in response.streaming_content)
+        elapsed = time.perf_counter() - start
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {
+            'tasks': size,
+            'bytes': written,
+            'seconds': round(elapsed, 3),
+            'rss_before_kb': baseline,
+            'rss_peak_kb': peak,
+        }
+    finally:
+        teardown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10000, 100000, 1000000])
+    parser.add_argument('--format', default='csv', choices=['csv', 'ndjson'])
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_one(args.child, args.format)))
+        return
+
+    print(f'{"tasks":>10} {"MB out":>8} {"seconds":>8} {"RSS before":>11} {"RSS peak":>9} {"growth":>7}')
+    for size in args.sizes:
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.export_memory', '--child', str(size), '--format', args.format],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        growth = (result['rss_peak_kb'] - result['rss_before_kb']) / 1024
+        print(f'{result["tasks"]:>10} {result["bytes"] / 2**20:>8.1f} {result["seconds"]:>8.2f} '
+              f'{result["rss_before_kb"] / 1024:>9.1f}MB {result["rss_peak_kb"] / 1024:>7.1f}MB {growth:>5.1f}MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Login throughput and the queries each login costs, against the old profile receiver.
+
+    python -m benchmarks.login [--logins 500] [--users 20] [--hasher md5|default]
+
+Every login is a POST to the login view with the test client, the whole
+middleware stack included. LoginView saves the user's last_login, which
+used to run a post_save receiver that loaded the profile and wrote it back
+in full. The "legacy" round connects that receiver again to show what it
+cost, the "current" round runs the tree as it is. Password hashing would
+hide the difference in the latency numbers, --hasher md5 (the default)
+swaps in a fast hasher; the query counts do not depend on it.
+"""
+import argparse
+import collections
+import time
+
+from .common import setup_django, percentiles
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def legacy_profile_save(sender, instance, **kwargs):
+    instance.profile.save()
+
+
+def run_round(users, logins, password):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    url = reverse('login')
+    latencies = []
+    queries = collections.Counter()
+    for i in range(logins):
+        user = users[i % len(users)]
+        client = Client()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.post(url, {'username': user.username, 'password': password})
+            latencies.append(time.perf_counter() - start)
+        assert response.status_code == 302, response.status_code
+        for query in captured:
+            queries[query['sql'].split(' ', 1)[0]] += 1
+    return {'rps': logins / sum(latencies), 'queries': sum(queries.values()) / logins,
+            'by_kind': {kind: n / logins for kind, n in sorted(queries.items())},
+            **percentiles(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=500)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--hasher', choices=['md5', 'default'], default='md5')
+    args = parser.parse_args()
+
+    teardown = setup_django()
+    try:
+        from django.contrib.auth.models import User
+        from django.db.models.signals import post_save
+        from django.test.utils import override_settings
+        from todo.synthetic import TaskDistribution, generate
+
+        password = 'bench-pass'
+        hashers = override_settings(PASSWORD_HASHERS=FAST_HASHERS) if args.hasher == 'md5' else override_settings()
+        with hashers:
+            users, _ = generate(args.users, TaskDistribution(tasks=(10, 10)), prefix='login', password=password)
+            # Warm-up: templates, URL resolver, first connection
+            run_round(users, 1, password)
+
+            post_save.connect(legacy_profile_save, sender=User)
+            try:
+                legacy = run_round(users, args.logins, password)
+            finally:
+                post_save.disconnect(legacy_profile_save, sender=User)
+            current = run_round(users, args.logins, password)
+    finally:
+        teardown()
+
+    print(f'{"round":<8} {"logins/s":>9} {"queries":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for name, r in [('legacy', legacy), ('current', current)]:
+        print(f'{name:<8} {r["rps"]:>9.1f} {r["queries"]:>8.1f} {r["p50_ms"]:>8.2f} {r["p95_ms"]:>8.2f} {r["p99_ms"]:>8.2f}')
+        print(f'{"":<8} ' + ', '.join(f'{kind} {n:g}' for kind, n in r['by_kind'].items()))
+    print(f'{legacy["queries"] - current["queries"]:g} queries saved per login')
+
+
+if __name__ == '__main__':
+    main()
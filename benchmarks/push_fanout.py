@@ -0,0 +1,125 @@
+"""
+Idle memory and fan-out latency of the task event stream (todo.push).
+
+    python -m benchmarks.push_fanout [--clients 10000] [--users 1000] [--rounds 20]
+
+--clients event streams are opened against the ASGI application from
+todoapp/asgi.py, spread evenly over --users logged-in users. Like
+asgi_vs_wsgi it runs in-process with no network in between. The number
+is the memory the streams hold in the process (tracemalloc and RSS);
+socket buffers and the server's own per-connection objects are not
+counted. Each round then publishes one event for every user from another
+thread, the way a task write after its commit does. It measures how long
+each stream takes to hand its copy to the server.
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+
+from .common import setup_django, percentiles
+
+
+def rss_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def session_cookies(users):
+    from django.test import Client
+    cookies = []
+    for user in users:
+        client = Client()
+        client.force_login(user)
+        cookies.append(f'sessionid={client.cookies["sessionid"].value}'.encode())
+    return cookies
+
+
+async def run(args, users, cookies):
+    from django.conf import settings
+    from todo.events import encode, get_backend
+    from todoapp.asgi import application
+
+    backend = get_backend()
+    received = {'round': -1, 'latencies': [], 'count': 0}
+    all_received = asyncio.Event()
+    published_at = [0.0]
+
+    def client(cookie):
+        inbox = asyncio.Queue()
+
+        async def send(message):
+            if message.get('body', b'').startswith(b'event: bench'):
+                received['latencies'].append(time.perf_counter() - published_at[0])
+                received['count'] += 1
+                if received['count'] == args.clients:
+                    all_received.set()
+        scope = {'type': 'http', 'path': settings.TODO_EVENTS_PATH, 'headers': [(b'cookie', cookie)],
+                 'method': 'GET', 'query_string': b''}
+        return inbox, asyncio.ensure_future(application(scope, inbox.get, send))
+
+    tracemalloc.start()
+    before, rss_before = tracemalloc.get_traced_memory()[0], rss_bytes()
+    start = time.perf_counter()
+    streams = [client(cookies[i % len(cookies)]) for i in range(args.clients)]
+    while sum(len(s) for s in backend.subscriptions.values()) < args.clients:
+        await asyncio.sleep(0.05)
+    connect_time = time.perf_counter() - start
+    await asyncio.sleep(0.5)
+    after, rss_after = tracemalloc.get_traced_memory()[0], rss_bytes()
+    tracemalloc.stop()
+
+    def publish_round(round_number):
+        message = encode('bench', {'round': round_number})
+        published_at[0] = time.perf_counter()
+        for user in users:
+            backend.publish(user.id, [message])
+
+    loop = asyncio.get_running_loop()
+    latencies = []
+    for round_number in range(args.rounds):
+        received.update(latencies=[], count=0)
+        all_received.clear()
+        await loop.run_in_executor(None, publish_round, round_number)
+        await asyncio.wait_for(all_received.wait(), 60)
+        latencies += received['latencies']
+
+    for inbox, _ in streams:
+        inbox.put_nowait({'type': 'http.disconnect'})
+    await asyncio.gather(*[task for _, task in streams])
+    return {
+        'connect_s': connect_time,
+        'traced_per_client': (after - before) / args.clients,
+        'rss_per_client': (rss_after - rss_before) / args.clients,
+        **percentiles(latencies),
+        'max_ms': max(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault('TODO_EVENTS_BACKEND', 'todo.events.LocalEvents')
+    teardown = setup_django()
+    try:
+        from todo.synthetic import TaskDistribution, generate
+        users, _ = generate(args.users, TaskDistribution(tasks=(0, 0)), prefix='push')
+        cookies = session_cookies(users)
+        result = asyncio.run(run(args, users, cookies))
+    finally:
+        teardown()
+
+    print(f'{args.clients} streams over {args.users} users, connected in {result["connect_s"]:.1f}s')
+    print(f'idle memory per stream: {result["traced_per_client"] / 1024:.1f} KiB traced, '
+          f'{result["rss_per_client"] / 1024:.1f} KiB RSS')
+    print(f'fan-out of one event per user, {args.rounds} rounds: p50 {result["p50_ms"]:.1f} ms, '
+          f'p95 {result["p95_ms"]:.1f} ms, p99 {result["p99_ms"]:.1f} ms, max {result["max_ms"]:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
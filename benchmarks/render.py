@@ -0,0 +1,99 @@
+"""
+Render time of a task list page with 1000 rows, with and without the template caches.
+
+    python -m benchmarks.render [--rows 1000] [--iterations 50]
+
+The page is task_list.html with its rows (todo.fragments.render_rows),
+the sidebar and main.html, rendered the way TaskList does after a miss
+of the task page cache. It is measured in these configurations:
+
+    no-loader-cache    TODO_CACHED_TEMPLATES=0, no fragment cache
+    no-fragments       the cached template loader, no fragment cache
+    cold               the fragment cache cleared before every render
+    warm               every row and the sidebar found in the cache
+    one-row-changed    warm, but one task moved since the last render
+
+Each configuration runs in its own process, the loader is picked when the
+settings load.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from .common import setup_django, make_user, make_tasks, percentiles
+
+MODES = {
+    'no-loader-cache': {'TODO_CACHED_TEMPLATES': '0', 'TODO_FRAGMENT_CACHE_TIMEOUT': '0'},
+    'no-fragments': {'TODO_CACHED_TEMPLATES': '1', 'TODO_FRAGMENT_CACHE_TIMEOUT': '0'},
+    'cold': {'TODO_CACHED_TEMPLATES': '1'},
+    'warm': {'TODO_CACHED_TEMPLATES': '1'},
+    'one-row-changed': {'TODO_CACHED_TEMPLATES': '1'},
+}
+
+
+def run_child(mode, args):
+    teardown = setup_django()
+    try:
+        import datetime
+        from django.contrib.auth.models import User
+        from django.template.loader import render_to_string
+        from django.test import RequestFactory
+        from todo.fragments import fragment_cache, render_rows
+        from todo.models import Task
+        from todo.views import task_counts
+
+        user = make_user()
+        make_tasks(user, args.rows)
+        user = User.objects.select_related('profile').get(pk=user.pk)
+        rows = list(Task.objects.filter(user=user)[:args.rows])
+        request = RequestFactory().get('/')
+        request.user = user
+
+        def render():
+            context = {'search_input': '', 'is_first_page': True, 'next_cursor': None, 'events_url': None,
+                       'task_rows': render_rows(rows), **task_counts(user.profile)}
+            return render_to_string('todo/task_list.html', context, request)
+
+        render()
+        latencies = []
+        for i in range(args.iterations):
+            if mode == 'cold':
+                fragment_cache().clear()
+            elif mode == 'one-row-changed':
+                task = rows[i % len(rows)]
+                task.updated_at += datetime.timedelta(microseconds=1)
+            start = time.perf_counter()
+            html = render()
+            latencies.append(time.perf_counter() - start)
+        return {'mode': mode, 'bytes': len(html), **percentiles(latencies)}
+    finally:
+        teardown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--child', choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args)))
+        return
+
+    print(f'{args.rows} rows')
+    print(f'{"mode":<16} {"p50 ms":>8} {"p95 ms":>8} {"mean ms":>8}')
+    for mode, env in MODES.items():
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.render', '--child', mode, *sys.argv[1:]],
+            check=True, capture_output=True, text=True, env=dict(os.environ, **env),
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f'{mode:<16} {r["p50_ms"]:>8.2f} {r["p95_ms"]:>8.2f} {r["mean_ms"]:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
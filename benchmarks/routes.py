@@ -0,0 +1,204 @@
+"""
+Throughput and latency of the main routes on synthetic data, with a JSON baseline.
+
+    python -m benchmarks.routes [--users 20] [--tasks 1000] [--iterations 200] [--threads 1]
+                                [--save baseline.json] [--compare baseline.json] [--tolerance 20]
+                                [--session-engine db|cached_db|signed_cookies] [--user-cache-ttl 5]
+
+Users and tasks come from todo.synthetic (the generate_data command). Each
+iteration picks a user and goes through the task routes with the test
+client, the whole middleware and URL stack included: the list, a search,
+create, update and delete of one task (so the data size stays put) and
+the profile page. Queries per request come from the Server-Timing header
+(todo.perf). --save writes the numbers with the commit they were
+measured on, --compare prints the change against such a file and exits
+with status 1 when a p95 got slower by more than --tolerance percent.
+
+--session-engine db --user-cache-ttl 0 is the request path without the
+session and user caches, compare against it to see the queries they save.
+--session-engine cached_db puts the sessions in the file cache
+(TODO_SESSION_CACHE=file), the engine's only allowed backend.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import ROOT, setup_django, percentiles
+
+ROUTES = ['alltasks', 'alltasks-search', 'create-task', 'update-task', 'delete-task', 'profile-edit']
+
+
+def iteration(client, user, rng, record):
+    from django.urls import reverse
+    from todo.models import Task
+    from todo.synthetic import WORDS
+
+    def timed(route, method, url, data=None, expect=(200,)):
+        start = time.perf_counter()
+        response = getattr(client, method)(url, data or {})
+        if response.streaming:
+            b''.join(response.streaming_content)
+        queries = re.search(r'desc="(\d+) queries"', response.get('Server-Timing', ''))
+        record(route, time.perf_counter() - start, int(queries.group(1)) if queries else None)
+        assert response.status_code in expect, (route, response.status_code)
+        return response
+
+    timed('alltasks', 'get', reverse('alltasks'))
+    timed('alltasks-search', 'get', reverse('alltasks'), {'search-area': rng.choice(WORDS)})
+
+    title = f'Benchmark task {rng.getrandbits(64):x}'
+    timed('create-task', 'post', reverse('create-task'), {'title': title, 'date': '2024-06-01'}, expect=(302,))
+    task_id = Task.objects.filter(user=user, title=title).values_list('id', flat=True).get()
+    timed('update-task', 'post', reverse('update-task', args=[task_id]),
+          {'title': title, 'description': 'updated', 'complete': 'on', 'date': '2024-06-02'}, expect=(302,))
+    timed('delete-task', 'post', reverse('delete-task', args=[task_id]), expect=(302,))
+    timed('profile-edit', 'get', reverse('profile-edit'))
+
+
+def run(args):
+    teardown = setup_django()
+    try:
+        from django.db import connection
+        from django.test import Client
+        from todo.synthetic import TaskDistribution, generate
+
+        users, _ = generate(args.users, TaskDistribution(tasks=(args.tasks, args.tasks)),
+                            prefix='bench', seed=args.seed)
+        latencies = {route: [] for route in ROUTES}
+        queries = {route: [] for route in ROUTES}
+        lock = threading.Lock()
+
+        def record(route, seconds, query_count):
+            with lock:
+                latencies[route].append(seconds)
+                if query_count is not None:
+                    queries[route].append(query_count)
+
+        def worker(worker_id):
+            rng = random.Random(args.seed + worker_id)
+            clients = {}
+            for _ in range(worker_id, args.iterations, args.threads):
+                user = rng.choice(users)
+                if user.id not in clients:
+                    clients[user.id] = Client()
+                    clients[user.id].force_login(user)
+                iteration(clients[user.id], user, rng, record)
+            connection.close()
+
+        # One warm-up round outside the numbers: template loading, first
+        # connection, the catalog and URL resolver caches
+        warm = Client()
+        warm.force_login(users[0])
+        iteration(warm, users[0], random.Random(0), lambda route, seconds, query_count: None)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(worker, range(args.threads)))
+        elapsed = time.perf_counter() - start
+
+        routes = {}
+        for route, values in latencies.items():
+            routes[route] = {'requests': len(values), 'rps': len(values) / sum(values), **percentiles(values),
+                             'queries': sum(queries[route]) / len(queries[route]) if queries[route] else None}
+        return {
+            'meta': {
+                'commit': git_commit(), 'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(), 'django': __import__('django').get_version(),
+                'database': connection.vendor, 'users': args.users, 'tasks_per_user': args.tasks,
+                'iterations': args.iterations, 'threads': args.threads,
+                'task_cache': os.environ.get('TODO_TASK_CACHE_TIMEOUT') != '0',
+                'session_engine': os.environ.get('TODO_SESSION_ENGINE', 'cached_db' if os.environ.get('TODO_SESSION_CACHE') else 'db'),
+                'user_cache_ttl': os.environ.get('TODO_USER_CACHE_TTL', '5'),
+            },
+            'requests': sum(len(values) for values in latencies.values()),
+            'rps': sum(len(values) for values in latencies.values()) / elapsed,
+            'routes': routes,
+        }
+    finally:
+        teardown()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def change(new, old):
+    return (new - old) / old * 100 if old else 0.0
+
+
+def report(result, baseline=None):
+    print(f'{result["requests"]} requests, {result["rps"]:.1f} req/s overall')
+    header = f'{"route":<16} {"req/s":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8}'
+    print(header + ('   p50 Δ%   p95 Δ% queries Δ' if baseline else ''))
+    for route, r in result['routes'].items():
+        line = (f'{route:<16} {r["rps"]:>7.1f} {r["p50_ms"]:>8.1f} {r["p95_ms"]:>8.1f} {r["p99_ms"]:>8.1f}'
+                f' {r.get("queries") or 0:>8.2f}')
+        old = (baseline or {}).get('routes', {}).get(route)
+        if old:
+            line += f' {change(r["p50_ms"], old["p50_ms"]):>+8.1f} {change(r["p95_ms"], old["p95_ms"]):>+8.1f}'
+            if r.get('queries') is not None and old.get('queries') is not None:
+                line += f' {r["queries"] - old["queries"]:>+9.2f}'
+        print(line)
+
+
+def regressions(result, baseline, tolerance):
+    return [route for route, r in result['routes'].items()
+            if route in baseline['routes'] and change(r['p95_ms'], baseline['routes'][route]['p95_ms']) > tolerance]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--tasks', type=int, default=1000, help='Tasks per user')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-cache', action='store_true', help='Turn the task page cache off')
+    parser.add_argument('--session-engine', choices=['db', 'cached_db', 'signed_cookies'])
+    parser.add_argument('--user-cache-ttl', type=int, help='Seconds, 0 turns the user cache off')
+    parser.add_argument('--save', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=20, help='Allowed p95 slowdown in percent')
+    args = parser.parse_args()
+
+    if args.no_cache:
+        os.environ['TODO_TASK_CACHE_TIMEOUT'] = '0'
+    if args.session_engine:
+        os.environ['TODO_SESSION_ENGINE'] = args.session_engine
+        if args.session_engine == 'cached_db':
+            os.environ.setdefault('TODO_SESSION_CACHE', 'file')
+    if args.user_cache_ttl is not None:
+        os.environ['TODO_USER_CACHE_TTL'] = str(args.user_cache_ttl)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    result = run(args)
+    report(result, baseline)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f'Saved to {args.save}')
+    if baseline:
+        slower = regressions(result, baseline, args.tolerance)
+        if slower:
+            print(f'p95 more than {args.tolerance:.0f}% slower than {baseline["meta"].get("commit")}: {", ".join(slower)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
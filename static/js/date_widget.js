@@ -0,0 +1,41 @@
+// "Today" shortcut next to the task date inputs (todo.forms.DateInput).
+// The calendar itself is the browser's own date picker.
+(function () {
+  "use strict";
+  var label = typeof window.gettext === "function" ? window.gettext("Today") : "Today";
+
+  function pad(n) {
+    return (n < 10 ? "0" : "") + n;
+  }
+
+  function today() {
+    var now = new Date();
+    return now.getFullYear() + "-" + pad(now.getMonth() + 1) + "-" + pad(now.getDate());
+  }
+
+  function addShortcut(input) {
+    var shortcuts = document.createElement("span");
+    var link = document.createElement("a");
+    shortcuts.className = "datetimeshortcuts";
+    link.href = "#";
+    link.textContent = label;
+    link.addEventListener("click", function (event) {
+      event.preventDefault();
+      input.value = today();
+      input.dispatchEvent(new Event("change", { bubbles: true }));
+    });
+    shortcuts.appendChild(document.createTextNode(" "));
+    shortcuts.appendChild(link);
+    input.insertAdjacentElement("afterend", shortcuts);
+  }
+
+  function init() {
+    Array.prototype.forEach.call(document.querySelectorAll("input.vDateField"), addShortcut);
+  }
+
+  if (document.readyState === "loading") {
+    document.addEventListener("DOMContentLoaded", init);
+  } else {
+    init();
+  }
+})();
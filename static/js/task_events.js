@@ -0,0 +1,66 @@
+// Live task list: applies the task changes pushed by the server
+// (todo.push) to the rows and the header counts instead of reloading the
+// page. New tasks are only inserted on the first page of an unfiltered list.
+(function () {
+  "use strict";
+
+  function plural(n) {
+    return n === 1 ? "" : "s";
+  }
+
+  function setCounts(counts) {
+    var open = document.querySelector('[data-count="open"]');
+    var total = document.querySelector('[data-count="total"]');
+    if (!counts) return;
+    if (open) open.textContent = "You have " + counts.open + " incomplete task" + plural(counts.open);
+    if (total) total.textContent = counts.total + " task" + plural(counts.total) + " in total";
+  }
+
+  function parseRow(html) {
+    var body = document.createElement("tbody");
+    body.innerHTML = html;
+    return body.querySelector("tr");
+  }
+
+  function init() {
+    var rows = document.getElementById("task-rows");
+    if (!rows || !rows.dataset.events || typeof window.EventSource !== "function") return;
+    var source = new EventSource(rows.dataset.events);
+    var opened = false;
+
+    function row(id) {
+      return rows.querySelector('tr[data-task-id="' + id + '"]');
+    }
+
+    function handle(type) {
+      source.addEventListener(type, function (event) {
+        var data = JSON.parse(event.data);
+        var current = row(data.id);
+        if (type === "deleted") {
+          if (current) current.remove();
+        } else if (current) {
+          current.replaceWith(parseRow(data.html));
+        } else if (type === "created" && rows.dataset.insertNew) {
+          rows.insertBefore(parseRow(data.html), rows.firstChild);
+        }
+        setCounts(data.counts);
+      });
+    }
+
+    ["created", "updated", "deleted"].forEach(handle);
+    source.addEventListener("reload", function () {
+      window.location.reload();
+    });
+    // Changes made while the stream was down were missed
+    source.addEventListener("open", function () {
+      if (opened) window.location.reload();
+      opened = true;
+    });
+  }
+
+  if (document.readyState === "loading") {
+    document.addEventListener("DOMContentLoaded", init);
+  } else {
+    init();
+  }
+})();
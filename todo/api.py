@@ -0,0 +1,167 @@
+import json
+from functools import wraps
+
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+
+from .bulk import apply_bulk
+from .forms import TaskForm
+from .models import Task
+from .pagination import paginate, DEFAULT_ORDERING
+from .search import search_tasks
+from .views import create_task_from
+
+
+# JSON task API for scripts, SPAs and mobile clients. Rows are read with
+# .values() and serialized as plain dicts, no model instances and no
+# templates. Authentication is the normal session login, unsafe methods
+# need the CSRF token in the X-CSRFToken header.
+API_FIELDS = ['id', 'title', 'description', 'complete', 'date', 'updated_at']
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'authentication required'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def error(message, status=400, **extra):
+    return JsonResponse({'error': message, **extra}, status=status)
+
+
+def select_fields(request):
+    # ?fields=id,title picks the columns, all of API_FIELDS by default
+    requested = request.GET.get('fields')
+    if not requested:
+        return API_FIELDS, None
+    fields = [field for field in requested.split(',') if field]
+    unknown = [field for field in fields if field not in API_FIELDS]
+    if unknown:
+        return None, error(f'unknown fields: {", ".join(unknown)}')
+    return fields, None
+
+
+def read_body(request):
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def value_errors(body):
+    # TaskForm's fields expect what a POST holds, strings; a number or a
+    # list would make them raise instead of failing validation
+    errors = {}
+    for field in TaskForm.Meta.fields:
+        value = body.get(field)
+        allowed = (str, bool) if field == 'complete' else str
+        if value is not None and not isinstance(value, allowed):
+            errors[field] = ['Enter a boolean.' if field == 'complete' else 'Enter a string or null.']
+    return errors
+
+
+def task_row(user, task_id, fields=API_FIELDS):
+    return Task.objects.filter(user=user, id=task_id).values(*fields).first()
+
+
+@api_login_required
+def tasks(request):
+    if request.method == 'GET':
+        return list_tasks(request)
+    if request.method == 'POST':
+        return create_task(request)
+    return error('method not allowed', status=405)
+
+
+def list_tasks(request):
+    fields, response = select_fields(request)
+    if response:
+        return response
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return error('limit must be a number')
+
+    queryset = Task.objects.filter(user=request.user)
+    ordering = DEFAULT_ORDERING
+    if request.GET.get('search'):
+        queryset = search_tasks(queryset, request.GET['search'])
+        ordering = ('-rank', 'id')
+    if request.GET.get('complete') in ('true', 'false'):
+        queryset = queryset.filter(complete=request.GET['complete'] == 'true')
+
+    # The cursor needs the ordering keys even when they were not asked for
+    keys = [field.lstrip('-') for field in ordering]
+    rows, next_cursor = paginate(
+        queryset.values(*fields, *[key for key in keys if key not in fields]),
+        request.GET.get('cursor'), limit, ordering,
+    )
+    results = [{field: row[field] for field in fields} for row in rows]
+    return JsonResponse({'results': results, 'next': next_cursor})
+
+
+def create_task(request):
+    body = read_body(request)
+    if body is None:
+        return error('body must be a JSON object')
+    if errors := value_errors(body):
+        return error('invalid task', errors=errors)
+    form = TaskForm(data=body)
+    if not form.is_valid():
+        return error('invalid task', errors=form.errors)
+    task = create_task_from(form, request.user)
+    return JsonResponse(task_row(request.user, task.id), status=201)
+
+
+@api_login_required
+def task(request, task_id):
+    if request.method == 'GET':
+        fields, response = select_fields(request)
+        if response:
+            return response
+        row = task_row(request.user, task_id, fields)
+        return JsonResponse(row) if row else error('not found', status=404)
+    if request.method in ('PATCH', 'PUT'):
+        return update_task(request, task_id)
+    if request.method == 'DELETE':
+        if not apply_bulk(request.user, [task_id], 'delete'):
+            return error('not found', status=404)
+        return HttpResponse(status=204)
+    return error('method not allowed', status=405)
+
+
+def update_task(request, task_id):
+    body = read_body(request)
+    if body is None:
+        return error('body must be a JSON object')
+    if errors := value_errors(body):
+        return error('invalid task', errors=errors)
+    # The row is locked from the read on, see views.update_task_from
+    with transaction.atomic():
+        instance = Task.objects.select_for_update().filter(user=request.user, id=task_id).first()
+        if instance is None:
+            return error('not found', status=404)
+        # PATCH only sends the changed fields, fill in the rest from the task
+        data = {field: getattr(instance, field) for field in TaskForm.Meta.fields}
+        data.update(body)
+        form = TaskForm(data=data, instance=instance)
+        if not form.is_valid():
+            return error('invalid task', errors=form.errors)
+        form.save()
+    return JsonResponse(task_row(request.user, task_id))
+
+
+# Flip complete with a single UPDATE, no read-modify-write
+@api_login_required
+def toggle_task(request, task_id):
+    if request.method != 'POST':
+        return error('method not allowed', status=405)
+    if not apply_bulk(request.user, [task_id], 'toggle'):
+        return error('not found', status=404)
+    return JsonResponse(task_row(request.user, task_id, ['id', 'complete', 'updated_at']))
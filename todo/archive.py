@@ -0,0 +1,72 @@
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .bulk import create_bulk
+from .counters import adjust_task_counts
+from .models import ArchivedTask, Task
+from .signals import tasks_bulk_changed
+
+
+# Hot/cold split. Tasks completed more than settings.TODO_ARCHIVE_AFTER_DAYS
+# days ago (by their last change) move from todo_task to todo_archivedtask,
+# so the task list, its counts and the search index only ever deal with
+# live tasks. Both directions move rows in batches, each batch one
+# INSERT ... and one DELETE in a transaction. For the rest of the app an
+# archived task is gone and a restored one new: tasks_bulk_changed goes out
+# as 'delete' and 'create', and the profile's counters move.
+ARCHIVE_FIELDS = ['id', 'user_id', 'title', 'description', 'complete', 'date', 'updated_at']
+ARCHIVE_ORDERING = ('-updated_at', '-id')
+
+
+def archivable(days, now=None):
+    cutoff = (now or timezone.now()) - datetime.timedelta(days=days)
+    return Task.objects.filter(complete=True, updated_at__lt=cutoff)
+
+
+def archive_completed(days, batch_size=1000, users=None, progress=None):
+    # Returns the number of tasks archived
+    tasks = archivable(days)
+    if users is not None:
+        tasks = tasks.filter(user__in=users)
+    archived = 0
+    while True:
+        moved = _archive_batch(tasks, batch_size)
+        if not moved:
+            return archived
+        archived += moved
+        if progress:
+            progress(archived)
+
+
+def _archive_batch(tasks, batch_size):
+    with transaction.atomic():
+        rows = list(tasks.select_for_update().order_by('id').values(*ARCHIVE_FIELDS)[:batch_size])
+        if not rows:
+            return 0
+        ArchivedTask.objects.bulk_create([ArchivedTask(**row) for row in rows])
+        moved = Task.objects.filter(id__in=[row['id'] for row in rows])
+        moved._raw_delete(moved.db)
+
+        by_user = {}
+        for row in rows:
+            by_user.setdefault(row['user_id'], []).append(row['id'])
+        for user_id, task_ids in by_user.items():
+            adjust_task_counts(user_id, total_delta=-len(task_ids))
+            tasks_bulk_changed.send(sender=Task, user_id=user_id, action='delete', task_ids=task_ids)
+    return len(rows)
+
+
+def restore_tasks(user, task_ids):
+    # Back into the task list, with the ids they had. updated_at becomes
+    # now, so the next archive run does not take them straight back.
+    # Returns the number of tasks restored.
+    archived = ArchivedTask.objects.filter(user=user, id__in=task_ids)
+    with transaction.atomic():
+        rows = list(archived.select_for_update().values(*ARCHIVE_FIELDS))
+        if not rows:
+            return 0
+        archived._raw_delete(archived.db)
+        create_bulk(user.id, [Task(**row) for row in rows])
+    return len(rows)
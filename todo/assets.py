@@ -0,0 +1,270 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+
+# Static asset bundles. Every bundle is the concatenation of its sources in
+# order (the cascade of the stylesheets depends on it), minified and written
+# to ASSETS_ROOT by `manage.py build_assets`, which then runs collectstatic
+# so the bundles get hashed names and .gz/.br siblings. Templates link them
+# with {% bundle %} (todo.templatetags.assets), which falls back to the
+# separate source files while TODO_BUNDLE_ASSETS is off.
+BUNDLES = {
+    'css/app.css': [
+        'css/style.css',
+        'css/authen.css',
+        'css/button.css',
+        'css/modal.css',
+        'css/profile.css',
+        'css/calendar.css',
+        'css/table.css',
+        'css/bootstrap.min.css',
+    ],
+    'js/app.js': [
+        'js/bootstrap.bundle.min.js',
+        'js/all.js',
+    ],
+}
+
+SOURCE_MAP = re.compile(r'^\s*(//[#@]|/\*[#@]) sourceMappingURL=.*$', re.MULTILINE)
+# Only allowed at the very start of a stylesheet, the bundle is UTF-8 anyway
+CHARSET = re.compile(r'@charset\s+"[^"]*";')
+
+
+# CSS: drop comments (but keep /*! licences), collapse whitespace and
+# remove it next to the punctuation where it never matters. Strings are
+# copied as they are, url("data:...") values included. Whitespace before a
+# colon stays, "a :hover" and "a:hover" are different selectors.
+CSS_TOKENS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*!.*?\*/)|(/\*.*?\*/)|(\s+)''', re.DOTALL)
+CSS_SPACE_AFTER = set('{};,>:')
+CSS_SPACE_BEFORE = set('{};,>')
+
+
+def minify_css(source):
+    out = ['']
+    last = 0
+    for match in CSS_TOKENS.finditer(source + ' '):
+        gap = source[last:match.start()].replace(';}', '}')
+        if gap.startswith('}') and out[-1].endswith(';'):
+            out[-1] = out[-1][:-1]
+        if gap:
+            out.append(gap)
+        string, licence, comment, space = match.groups()
+        if string:
+            out.append(string)
+        elif licence:
+            out.append(licence + '\n')
+        elif space:
+            previous = out[-1][-1:]
+            following = source[match.end():match.end() + 1]
+            if previous not in CSS_SPACE_AFTER | {'', ' ', '\n'} and following not in CSS_SPACE_BEFORE:
+                out.append(' ')
+        last = match.end()
+    return ''.join(out).strip() + '\n'
+
+
+# JS: a jsmin-style pass. Comments go (except /*! licences), indentation and
+# runs of blanks shrink to nothing or one character. A line break is kept
+# as a newline so automatic semicolon insertion still sees it. Strings,
+# template literals and regular expression literals are copied untouched.
+WORD = re.compile(r'[\w$\\]')
+REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^') | {''}
+REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'instanceof', 'new', 'throw', 'void', 'delete'}
+
+
+def _regex_allowed(out):
+    # A slash starts a regular expression after an operator or a keyword,
+    # and is a division after a value
+    text = ''.join(out[-20:]).rstrip()
+    if not text or text[-1] in REGEX_AFTER:
+        return True
+    word = re.search(r'[\w$]+$', text)
+    return bool(word) and word.group() in REGEX_KEYWORDS
+
+
+def _skip_string(source, i):
+    quote = source[i]
+    i += 1
+    while i < len(source) and source[i] != quote:
+        i += 2 if source[i] == '\\' else 1
+    return i + 1
+
+
+def _skip_regex(source, i):
+    i += 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            break
+        i += 1
+    i += 1
+    while i < len(source) and WORD.match(source[i]):
+        i += 1
+    return i
+
+
+def minify_js(source):
+    out = []
+    i = 0
+    n = len(source)
+    pending = ''  # whitespace seen since the last token: '', ' ' or '\n'
+    while i < n:
+        char = source[i]
+        if char in ' \t\r\n\f\v':
+            if char == '\n':
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            i += 1
+            continue
+        if source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            if source.startswith('/*!', i):
+                out.append(source[i:end] + '\n')
+                pending = ''
+            elif '\n' in source[i:end]:
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            i = end
+            continue
+
+        if pending and out:
+            previous = out[-1][-1]
+            if pending == '\n' and previous not in '{;,(=:[\n' and char not in '}),;.]':
+                # A statement may end here without a semicolon
+                out.append('\n')
+            elif WORD.match(previous) and WORD.match(char) or previous in '+-' and char == previous:
+                out.append(' ')
+        pending = ''
+
+        if char in '"\'`':
+            end = _skip_string(source, i)
+            out.append(source[i:end])
+            i = end
+        elif char == '/' and _regex_allowed(out):
+            end = _skip_regex(source, i)
+            out.append(source[i:end])
+            i = end
+        else:
+            out.append(char)
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def bundle_sources(name):
+    # Paths of the source files of a bundle, found through the static finders
+    paths = []
+    for source in BUNDLES[name]:
+        path = finders.find(source)
+        if path is None:
+            raise FileNotFoundError(f'{source} (in {name}) is not a static file')
+        paths.append(path)
+    return paths
+
+
+def build_bundle(name):
+    minify = MINIFIERS[os.path.splitext(name)[1]]
+    parts = []
+    for path in bundle_sources(name):
+        with open(path, encoding='utf-8') as f:
+            source = SOURCE_MAP.sub('', f.read())
+        if name.endswith('.css'):
+            source = CHARSET.sub('', source)
+        # Sources that ship minified are only concatenated
+        if '.min.' not in os.path.basename(path):
+            source = minify(source)
+        parts.append(source.strip())
+    # Scripts are separated by a semicolon so one without a trailing one
+    # cannot run into the next
+    separator = '\n' if name.endswith('.css') else ';\n'
+    return separator.join(parts) + '\n'
+
+
+def write_bundles(root=None):
+    # Build every bundle into ASSETS_ROOT, returns {name: size}
+    root = root or settings.ASSETS_ROOT
+    sizes = {}
+    for name in BUNDLES:
+        content = build_bundle(name).encode('utf-8')
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        sizes[name] = len(content)
+    return sizes
+
+
+# Serve collected files from STATIC_ROOT when no web server sits in front
+# of the app. Hashed names never change, so they are cached for a year;
+# the precompressed sibling is sent when the client accepts it.
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def is_hashed_static(path):
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    return path in hashed_files.values() and path not in hashed_files
+
+
+def accepted_encodings(request):
+    accepted = request.headers.get('Accept-Encoding', '')
+    return {part.split(';')[0].strip().lower() for part in accepted.split(',')}
+
+
+def serve(request, path):
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('No such file')
+    if not os.path.isfile(fullpath):
+        raise Http404('No such file')
+    stat = os.stat(fullpath)
+    cache_control = IMMUTABLE if is_hashed_static(path) else REVALIDATE
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        response = HttpResponseNotModified()
+        response['Cache-Control'] = cache_control
+        return response
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    encoding = None
+    accepted = accepted_encodings(request)
+    for name, suffix in ENCODINGS:
+        if name in accepted and os.path.isfile(fullpath + suffix):
+            encoding, fullpath = name, fullpath + suffix
+            break
+
+    response = FileResponse(open(fullpath, 'rb'), content_type=content_type or 'application/octet-stream',
+                            filename=os.path.basename(path))
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    response['Vary'] = 'Accept-Encoding'
+    return response
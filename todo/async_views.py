@@ -0,0 +1,129 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import render, redirect
+
+from .cache import task_cache, page_key
+from .conditional import user_condition, user_profile_row
+from .forms import TaskForm
+from .models import Profile, Task
+from .pagination import apaginate
+from .replicas import replica_reads
+from .views import (TaskList, task_page_query, task_page, task_counts, events_url,
+                    create_task_from, update_task_from, delete_task_from)
+
+
+# Async versions of the task views, used for the main routes when the app
+# is served through todoapp/asgi.py (settings.TODO_ASYNC_VIEWS). The ORM
+# reads are the async ones (aget, async for), the request does not hold a
+# worker thread while it waits on them. Writes go through the sync helpers
+# of views.py in a thread: they need a transaction, which the async ORM
+# has no form of.
+#
+# Templates must not touch the database in an async view, so the user and
+# their profile (for the sidebar avatar) are loaded before rendering, unless
+# the profile came with the cached user (todo.auth). Rendering, with its
+# fragment cache and thumbnail lookups, runs in a thread (arender) so it
+# does not block the event loop.
+
+async def auth_user(request):
+    # The logged-in user with the profile attached, or None
+    is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not is_authenticated:
+        return None
+    user = request.user
+    if not User.profile.related.is_cached(user):
+        try:
+            user.profile = await Profile.objects.aget(user=user)
+        except Profile.DoesNotExist:
+            pass
+    return user
+
+
+async def arender(request, template_name, context):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def aget_task(user, task_id):
+    try:
+        return await Task.objects.aget(pk=task_id, user=user)
+    except (Task.DoesNotExist, ValueError):
+        raise Http404('No such task')
+
+
+# Show all tasks
+@replica_reads
+@user_condition
+async def atask_list(request):
+    user = await auth_user(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+    search_input = request.GET.get('search-area') or ''
+    cursor = request.GET.get('cursor') or ''
+
+    cache = task_cache()
+    # Read by user_condition already
+    profile_row = await sync_to_async(user_profile_row)(request)
+    key = page_key(user.id, profile_row and profile_row['updated_at'], search_input, cursor)
+    page = await cache.aget(key)
+    if page is None:
+        tasks, ordering = task_page_query(Task.objects.filter(user=user), search_input)
+        rows, next_cursor = await apaginate(tasks, cursor, TaskList.page_size, ordering)
+        page = await sync_to_async(task_page)(rows, next_cursor)
+        page.pop('alltasks')
+        await cache.aset(key, page)
+
+    context = {'search_input': search_input, 'is_first_page': not cursor, **page, **task_counts(profile_row),
+               'events_url': events_url()}
+    return await arender(request, 'todo/task_list.html', context)
+
+# Create new task
+async def ataskcreate(request):
+    user = await auth_user(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+    if request.method == "POST":
+        form = TaskForm(request.POST)
+
+        if form.is_valid():
+            await sync_to_async(create_task_from)(form, user)
+            return HttpResponseRedirect('/')
+    else:
+        form = TaskForm
+
+    return await arender(request, 'todo/task_form.html', {'form': form})
+
+# Update created task
+async def ataskupdate(request, task_id):
+    user = await auth_user(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+    if request.method == "POST":
+        try:
+            task, form, saved = await sync_to_async(update_task_from)(
+                Task.objects.filter(user=user), task_id, request.POST)
+        except (Task.DoesNotExist, ValueError):
+            raise Http404('No such task')
+        if saved:
+            return redirect('alltasks')
+    else:
+        task = await aget_task(user, task_id)
+        form = TaskForm(instance=task)
+
+    return await arender(request, 'todo/task_update.html', {'task': task, 'form': form})
+
+# Delete task
+async def ataskdelete(request, task_id):
+    user = await auth_user(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+    if request.method == "POST":
+        try:
+            await sync_to_async(delete_task_from)(Task.objects.filter(user=user), task_id)
+        except (Task.DoesNotExist, ValueError):
+            raise Http404('No such task')
+        return redirect('alltasks')
+    task = await aget_task(user, task_id)
+
+    return await arender(request, 'todo/confirm_delete.html', {'task': task,})
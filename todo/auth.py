@@ -0,0 +1,32 @@
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import caches
+
+
+# Per-process cache of the logged-in User with its Profile, so a request
+# resolves request.user and request.user.profile without a query. The
+# session checks stay in django.contrib.auth.get_user(), only the row
+# lookup is cached, for settings.TODO_USER_CACHE_TTL seconds (the "users"
+# cache, local memory). Writes in this process drop the entry right away
+# (signals.py, counters.py), other processes see them after the TTL.
+
+def user_key(user_id):
+    return f'user:{user_id}'
+
+
+def forget_user(user_id):
+    caches['users'].delete(user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        cache = caches['users']
+        user = cache.get(user_key(user_id))
+        if user is None:
+            try:
+                # The profile comes along in the same query
+                user = User._default_manager.select_related('profile').get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            cache.set(user_key(user_id), user)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,73 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .counters import adjust_task_counts
+from .models import Task
+from .signals import tasks_bulk_changed
+
+
+# Bulk task actions. Each one is a single UPDATE / DELETE ... WHERE id IN
+# (...) AND user_id = ? inside one transaction, no per-row save(). Row
+# signals do not fire for these statements, tasks_bulk_changed tells the
+# receivers in signals.py what happened instead. The profile's task
+# counters are moved here, from the rows as they were locked.
+ACTIONS = ['complete', 'uncomplete', 'toggle', 'delete', 'shift']
+
+
+def apply_bulk(user, task_ids, action, days=0):
+    # Returns the number of tasks changed
+    tasks = Task.objects.filter(user=user, id__in=task_ids)
+    with transaction.atomic():
+        completes = dict(tasks.select_for_update().values_list('id', 'complete'))
+        ids = list(completes)
+        if action == 'delete':
+            # _raw_delete skips the collector, which would load every row
+            # to send post_delete; nothing has a foreign key to Task
+            changed = tasks._raw_delete(tasks.db)
+        else:
+            changed = tasks.update(updated_at=timezone.now(), **_changes(action, days))
+        if changed:
+            open_delta, total_delta = _count_changes(action, list(completes.values()).count(False), len(ids))
+            # Also when the counts stay, for the profile's updated_at
+            adjust_task_counts(user.id, open_delta, total_delta)
+            tasks_bulk_changed.send(sender=Task, user_id=user.id, action=action, task_ids=ids)
+    return changed
+
+
+def create_bulk(user_id, tasks):
+    # Inserts new Task objects of one user in one INSERT, with the same
+    # counter move and tasks_bulk_changed as the actions above: the
+    # importer, the archive's restore and the synthetic data go through it
+    with transaction.atomic():
+        Task.objects.bulk_create(tasks)
+        adjust_task_counts(user_id, sum(not task.complete for task in tasks), len(tasks))
+        tasks_bulk_changed.send(sender=Task, user_id=user_id, action='create',
+                                task_ids=[task.id for task in tasks])
+    return tasks
+
+
+def _count_changes(action, open_tasks, total):
+    # (open, total) counter deltas for an action on total tasks of which
+    # open_tasks were not complete
+    done = total - open_tasks
+    return {
+        'delete': (-open_tasks, -total),
+        'complete': (-open_tasks, 0),
+        'uncomplete': (done, 0),
+        'toggle': (done - open_tasks, 0),
+    }.get(action, (0, 0))
+
+
+def _changes(action, days):
+    if action == 'complete':
+        return {'complete': True}
+    if action == 'uncomplete':
+        return {'complete': False}
+    if action == 'toggle':
+        return {'complete': Case(When(complete=True, then=Value(False)), default=Value(True))}
+    if action == 'shift':
+        return {'date': F('date') + datetime.timedelta(days=days)}
+    raise ValueError(f'Unknown bulk action: {action}')
@@ -0,0 +1,24 @@
+import hashlib
+
+from django.core.cache import caches
+
+
+# Per-user cache of rendered task list pages (settings.CACHES['tasks']).
+# Every key carries the profile's updated_at, which every write to the
+# user's tasks moves (todo.counters.adjust_task_counts) and which the page's
+# ETag and Last-Modified are built from (conditional.py), read from the
+# database on each request. A write in another process, or a page built
+# from a lagging replica, gets a key of its own rather than being served
+# under a newer ETag; old pages age out through the cache's TIMEOUT /
+# MAX_ENTRIES.
+TASK_CACHE = 'tasks'
+
+
+def task_cache():
+    return caches[TASK_CACHE]
+
+
+def page_key(user_id, last_modified, *parts):
+    digest = hashlib.md5('\0'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    version = last_modified.timestamp() if last_modified else 0
+    return f'tasks:page:{user_id}:{version}:{digest}'
@@ -0,0 +1,86 @@
+import functools
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import Profile
+
+
+# Conditional GET for the per-user pages. A page changes only when one of
+# the user's tasks or their profile changes, and every such write moves the
+# profile's updated_at: userUpdate saves the profile, and the task writes go
+# through todo.counters.adjust_task_counts (signals.py, bulk.py, the
+# importer, the archive). So that one timestamp is the page's Last-Modified,
+# read by primary key rather than from the user's tasks, which would cost
+# more than the page it guards. It is read from the database, not from the
+# cached request.user.profile (todo.auth), which another process's write
+# leaves stale for a few seconds. The task counters come along in the same
+# query, so the header counts are as current as the ETag.
+
+def user_profile_row(request):
+    # {'updated_at', 'open_count', 'total_count'} of the user's profile,
+    # read once per request
+    if not request.user.is_authenticated:
+        return None
+    if not hasattr(request, '_todo_profile_row'):
+        request._todo_profile_row = (Profile.objects.filter(user_id=request.user.id)
+                                     .values('updated_at', 'open_count', 'total_count').first())
+    return request._todo_profile_row
+
+
+def user_last_modified(request, *args, **kwargs):
+    row = user_profile_row(request)
+    return row['updated_at'] if row else None
+
+
+def user_etag(request, *args, **kwargs):
+    last_modified = user_last_modified(request)
+    if last_modified is None:
+        return None
+    # The CSRF secret is part of the page (forms embed its token), a new one
+    # after login must not match the page cached before it. get_token() makes
+    # sure the secret exists before the first response is tagged.
+    get_token(request)
+    parts = [str(request.user.id), last_modified.isoformat(), request.META['CSRF_COOKIE']]
+    return hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+# Answer 304 Not Modified without rendering when the browser's copy is
+# current, and make the browser revalidate instead of trusting its copy
+def user_condition(view):
+    if iscoroutinefunction(view):
+        return async_user_condition(view)
+    view = condition(etag_func=user_etag, last_modified_func=user_last_modified)(view)
+    return cache_control(private=True, no_cache=True)(view)
+
+
+def validators(request):
+    # (quoted ETag, Last-Modified timestamp) the way condition() makes them
+    etag = user_etag(request)
+    last_modified = user_last_modified(request)
+    return (quote_etag(etag) if etag else None,
+            int(last_modified.timestamp()) if last_modified else None)
+
+
+# The same for async views, Django's condition() and cache_control() only
+# wrap sync ones. The validators read the database in a thread.
+def async_user_condition(view):
+    @functools.wraps(view)
+    async def inner(request, *args, **kwargs):
+        etag, last_modified = await sync_to_async(validators)(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await view(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            if last_modified and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault('ETag', etag)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return inner
@@ -0,0 +1,53 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .auth import forget_user
+from .models import Profile, Task
+
+
+# Per-user task counters on Profile: open_count and total_count, so the
+# task list header is one row read instead of counting the user's tasks.
+# Every write moves them in the same transaction with F() expressions,
+# the database adds the delta so concurrent writers do not lose updates:
+# signals.py for single tasks, bulk.py for the bulk writes (the importer,
+# the archive and synthetic.py insert through bulk.create_bulk). reconcile() recounts and repairs any drift
+# (manage.py reconcile_task_counts).
+
+def adjust_task_counts(user_id, open_delta=0, total_delta=0):
+    # Also moves the profile's updated_at, the Last-Modified of the user's
+    # pages (see conditional.py): every task write comes through here
+    Profile.objects.filter(user_id=user_id).update(
+        open_count=F('open_count') + open_delta,
+        total_count=F('total_count') + total_delta,
+        updated_at=timezone.now(),
+    )
+    forget_user(user_id)
+
+
+def counted(**filters):
+    # The profile's user's tasks, counted in a subquery
+    tasks = (Task.objects.filter(user=OuterRef('user'), **filters).order_by()
+             .values('user').annotate(n=Count('id')).values('n'))
+    return Coalesce(Subquery(tasks), 0)
+
+
+def drifted(profiles=None):
+    # Profiles whose counters do not match their tasks, with the real counts
+    # as actual_open and actual_total
+    profiles = Profile.objects.all() if profiles is None else profiles
+    profiles = profiles.annotate(actual_open=counted(complete=False), actual_total=counted())
+    return profiles.exclude(open_count=F('actual_open'), total_count=F('actual_total'))
+
+
+def reconcile(profiles=None):
+    # Recount the drifted profiles in one UPDATE, the counts are taken by
+    # the statement itself so a write in between is not overwritten.
+    # Returns the number of profiles repaired.
+    ids = dict(drifted(profiles).values_list('id', 'user_id'))
+    repaired = Profile.objects.filter(id__in=ids).update(
+        open_count=counted(complete=False), total_count=counted(), updated_at=timezone.now(),
+    )
+    for user_id in ids.values():
+        forget_user(user_id)
+    return repaired
@@ -0,0 +1,235 @@
+import asyncio
+import collections
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .fragments import render_row
+from .models import Profile, Task
+
+logger = logging.getLogger('todo.events')
+
+
+# Task change events for the push channel (todo.push). Task signals hand
+# them to the backend once the transaction commits, the backend hands them
+# to the subscriptions of the task's user: one per open event stream.
+#
+# An event is a server-sent event message, encoded once when published so
+# fanning it out to many streams is only a queue put each:
+#   created, updated  {"id", "complete", "html": the task_row.html row, "counts"}
+#   deleted           {"id", "counts"}
+#   reload            {}  (too much changed at once, or a stream fell behind)
+# counts are the header numbers, {"open", "total"} from the profile.
+MAX_BULK_EVENTS = 50
+
+
+def encode(event_type, data):
+    return f'event: {event_type}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode()
+
+
+RELOAD = encode('reload', {})
+
+
+class Subscription:
+    # The events of one user for one stream, read on the event loop that
+    # serves the stream. The backend puts to it through that loop.
+    def __init__(self, backend, user_id, maxsize):
+        self.backend = backend
+        self.user_id = user_id
+        self.maxsize = maxsize
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def put(self, messages):
+        for message in messages:
+            if self.queue.qsize() >= self.maxsize:
+                # A stream this far behind gets the page reloaded instead
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait(RELOAD)
+                return
+            self.queue.put_nowait(message)
+
+    # None ends the stream
+    def stop(self):
+        self.queue.put_nowait(None)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+def put_all(subscriptions, messages):
+    for subscription in subscriptions:
+        subscription.put(messages)
+
+
+class EventBackend:
+    def __init__(self):
+        self.subscriptions = collections.defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id, settings.TODO_EVENTS_QUEUE_SIZE)
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.user_id]
+
+    # Whether events for the user have to be built at all
+    def listening(self, user_id):
+        raise NotImplementedError
+
+    # Encoded messages for one user, called after the commit
+    def publish(self, user_id, messages):
+        raise NotImplementedError
+
+    # Hand messages to this process's subscriptions, one wake-up per event
+    # loop rather than one per stream
+    def deliver(self, user_id, messages):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+        by_loop = collections.defaultdict(list)
+        for subscription in subscriptions:
+            by_loop[subscription.loop].append(subscription)
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(put_all, subscriptions, messages)
+            except RuntimeError:
+                # The loop closed under a stream that did not unsubscribe
+                pass
+
+
+# Subscriptions and publishers in one process
+class LocalEvents(EventBackend):
+    def listening(self, user_id):
+        return user_id in self.subscriptions
+
+    def publish(self, user_id, messages):
+        self.deliver(user_id, messages)
+
+
+# Postgres LISTEN/NOTIFY, for several worker processes on one database.
+# Every process publishes with NOTIFY and listens on its own connection in
+# a background thread, started with the first subscription, then delivers
+# to its local subscriptions.
+class PostgresEvents(EventBackend):
+    channel = 'todo_events'
+    # NOTIFY payloads must stay under 8000 bytes
+    max_payload = 7900
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+
+    def listening(self, user_id):
+        # Subscriptions in other processes are not known here
+        return True
+
+    def publish(self, user_id, messages):
+        with connection.cursor() as cursor:
+            for message in messages:
+                payload = json.dumps({'user': user_id, 'message': message.decode()})
+                if len(payload.encode()) > self.max_payload:
+                    payload = json.dumps({'user': user_id, 'message': RELOAD.decode()})
+                cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def subscribe(self, user_id):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name='todo-events', daemon=True)
+                self.listener.start()
+        return super().subscribe(user_id)
+
+    def listen(self):
+        # A connection of our own, outside Django's per-thread handling
+        while True:
+            try:
+                db = connection.get_new_connection(connection.get_connection_params())
+                db.autocommit = True
+                with db.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                while True:
+                    if select.select([db], [], [], 60) == ([], [], []):
+                        continue
+                    db.poll()
+                    while db.notifies:
+                        notify = db.notifies.pop(0)
+                        payload = json.loads(notify.payload)
+                        self.deliver(payload['user'], [payload['message'].encode()])
+            except Exception:
+                logger.exception('Event listener failed, reconnecting')
+                threading.Event().wait(1)
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.TODO_EVENTS_BACKEND)()
+    return _backend
+
+
+def counts(user_id):
+    row = Profile.objects.filter(user_id=user_id).values('open_count', 'total_count').first() or {}
+    return {'open': row.get('open_count', 0), 'total': row.get('total_count', 0)}
+
+
+def task_message(event_type, task, task_counts):
+    data = {'id': task.id, 'complete': task.complete, 'counts': task_counts}
+    data['html'] = render_row(task)
+    return encode(event_type, data)
+
+
+def publish_task(event_type, task):
+    # One task saved or deleted
+    backend = get_backend()
+    user_id, task_id = task.user_id, task.id
+
+    def send():
+        if not backend.listening(user_id):
+            return
+        if event_type == 'deleted':
+            message = encode('deleted', {'id': task_id, 'counts': counts(user_id)})
+        else:
+            message = task_message(event_type, task, counts(user_id))
+        backend.publish(user_id, [message])
+    transaction.on_commit(send)
+
+
+def publish_bulk(user_id, action, task_ids):
+    # A todo.bulk action or a bulk insert, one reload for large ones
+    backend = get_backend()
+    task_ids = list(task_ids)
+
+    def send():
+        if not backend.listening(user_id):
+            return
+        if len(task_ids) > MAX_BULK_EVENTS:
+            backend.publish(user_id, [RELOAD])
+            return
+        task_counts = counts(user_id)
+        if action == 'delete':
+            messages = [encode('deleted', {'id': task_id, 'counts': task_counts}) for task_id in task_ids]
+        else:
+            event_type = 'created' if action == 'create' else 'updated'
+            messages = [task_message(event_type, task, task_counts)
+                        for task in Task.objects.filter(id__in=task_ids)]
+        backend.publish(user_id, messages)
+    transaction.on_commit(send)
@@ -1,10 +1,15 @@
 from django import forms
 from django.forms import ModelForm
 from .models import Profile, Task
+from .images import process_avatar
+from .bulk import ACTIONS
+
+from .i18n import catalog_url
 
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
-from django.contrib.admin.widgets import AdminDateWidget
+from django.templatetags.static import static
+from django.utils.html import format_html
 
 class RegisterForm(UserCreationForm):    
     class Meta:
@@ -22,12 +27,68 @@ class ProfileUpdateForm(forms.ModelForm):
     class Meta:
         model = Profile
         fields = ['image']
+    
+    # Store a resized, recompressed copy instead of the raw upload
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if image and 'image' in self.changed_data:
+            image = process_avatar(image)
+        return image
         
+# Media script loaded with defer, it does not hold up the page below it
+class DeferredScript:
+    def __init__(self, src):
+        self.src = src
+
+    def __eq__(self, other):
+        return isinstance(other, DeferredScript) and self.src == other.src
+
+    def __hash__(self):
+        return hash(self.src)
+
+    def __html__(self):
+        return format_html('<script src="{}" defer></script>', self.src)
+
+# The browser's own date picker plus a "Today" shortcut, without the admin
+# calendar and the jQuery and jsi18n scripts it needs on every page
+class DateInput(forms.DateInput):
+    input_type = 'date'
+
+    def __init__(self, attrs=None):
+        super().__init__(attrs={'class': 'vDateField', **(attrs or {})}, format='%Y-%m-%d')
+
+    @property
+    def media(self):
+        return forms.Media(js=[DeferredScript(catalog_url()), DeferredScript(static('js/date_widget.js'))])
+
 class TaskForm(forms.ModelForm):
     date = forms.DateField(
-        widget=AdminDateWidget()        
+        widget=DateInput()
     )
     
     class Meta:
         model = Task
-        fields = ['title', 'description', 'complete', 'date']
\ No newline at end of file
+        fields = ['title', 'description', 'complete', 'date']
+
+# Task ids from the list checkboxes. Any id is accepted here, apply_bulk
+# only touches the user's own tasks.
+class TaskIdsField(forms.TypedMultipleChoiceField):
+    def __init__(self, **kwargs):
+        super().__init__(coerce=int, **kwargs)
+    
+    def valid_value(self, value):
+        return str(value).isdigit()
+
+class BulkTaskForm(forms.Form):
+    action = forms.ChoiceField(choices=[(action, action.title()) for action in ACTIONS])
+    days = forms.IntegerField(required=False, initial=1, min_value=-3650, max_value=3650)
+    task_ids = TaskIdsField()
+
+
+class RestoreTaskForm(forms.Form):
+    task_ids = TaskIdsField()
+
+
+class ImportTaskForm(forms.Form):
+    file = forms.FileField()
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('ndjson', 'NDJSON')])
@@ -0,0 +1,54 @@
+from django.core.cache import caches
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+
+# Rendered template fragments (settings.CACHES['template_fragments'], also
+# the cache of the {% cache %} tag).
+#
+# Task rows are keyed by task id and updated_at, which every save and bulk
+# action moves: a changed task gets a new key and the old one ages out.
+# A page that missed the task page cache (todo.cache) re-renders only the
+# rows that changed, all of its rows are looked up in one get_many.
+#
+# The sidebar (greeting and profile card) is keyed by what it shows, taken
+# from request.user and its profile. A version number bumped on save would
+# live in this process's cache only (locmem, unless TODO_TASK_CACHE=file)
+# and leave the other processes on the old sidebar; the key changes in
+# every process once its copy of the user does, after the user cache's TTL
+# at most (todo.auth).
+FRAGMENT_CACHE = 'template_fragments'
+
+
+def fragment_cache():
+    return caches[FRAGMENT_CACHE]
+
+
+def row_key(task):
+    return f'row:{task.id}:{task.updated_at.timestamp()}'
+
+
+def render_row(task):
+    return get_template('todo/task_row.html').render({'task': task})
+
+
+def render_rows(tasks):
+    cache = fragment_cache()
+    keys = [row_key(task) for task in tasks]
+    cached = cache.get_many(keys)
+    template = get_template('todo/task_row.html')
+    rows, missing = [], {}
+    for task, key in zip(tasks, keys):
+        row = cached.get(key)
+        if row is None:
+            row = missing[key] = template.render({'task': task})
+        rows.append(row)
+    if missing:
+        cache.set_many(missing)
+    return mark_safe(''.join(rows))
+
+
+def sidebar_key(user):
+    profile = getattr(user, 'profile', None)
+    return repr((user.id, user.username, user.email, user.first_name, user.last_name,
+                 profile.image.name if profile else None))
@@ -0,0 +1,30 @@
+import functools
+import hashlib
+
+from django.http import HttpRequest
+from django.urls import reverse
+from django.utils import translation
+from django.views.i18n import JavaScriptCatalog
+
+
+# The JavaScript catalog only changes with a deploy (new .mo files), so it
+# is rendered once per language and process instead of on every request.
+# Its URL carries a digest of the content: browsers keep it for a year and
+# a new catalog gets a new URL.
+
+def supported_language(language=None):
+    # Raises LookupError for a language that is not in settings.LANGUAGES
+    return translation.get_supported_language_variant(language or translation.get_language())
+
+
+@functools.lru_cache(maxsize=None)
+def catalog(language):
+    # (JavaScript source, digest) of the catalog for a supported language
+    with translation.override(language):
+        content = JavaScriptCatalog().get(HttpRequest()).content
+    return content, hashlib.sha256(content).hexdigest()[:12]
+
+
+def catalog_url(language=None):
+    language = supported_language(language)
+    return reverse('js-catlog', args=[language, catalog(language)[1]])
@@ -0,0 +1,78 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+
+# Avatar processing. Uploads are capped to AVATAR_MAX_SIZE and re-encoded
+# once at upload time, the fixed AVATAR_THUMBNAIL_SIZES are cut from the
+# stored image on first use and kept next to it under thumbs/.
+
+def avatar_format():
+    # WebP when Pillow was built with it, JPEG otherwise
+    if settings.AVATAR_FORMAT == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return settings.AVATAR_FORMAT
+
+
+def _extension(image_format):
+    return '.jpg' if image_format == 'JPEG' else '.' + image_format.lower()
+
+
+def _encode(image):
+    image_format = avatar_format()
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG has no alpha, flatten transparent avatars onto white
+        background = Image.new('RGB', image.size, 'white')
+        image = image.convert('RGBA')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    options = {'method': 4} if image_format == 'WEBP' else {'optimize': True}
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=settings.AVATAR_QUALITY, **options)
+    return buffer.getvalue()
+
+
+def process_avatar(upload):
+    # Returns the uploaded image resized and re-encoded as a ContentFile
+    with Image.open(upload) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((settings.AVATAR_MAX_SIZE, settings.AVATAR_MAX_SIZE))
+        data = _encode(image)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return ContentFile(data, name=stem + _extension(avatar_format()))
+
+
+THUMBNAIL_FOLDER = 'thumbs'
+
+
+def thumbnail_name(name, size):
+    folder, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(folder, THUMBNAIL_FOLDER, f'{stem}_{size}{_extension(avatar_format())}')
+
+
+def is_thumbnail(name):
+    return os.path.basename(os.path.dirname(name)) == THUMBNAIL_FOLDER
+
+
+def thumbnail_url(image_field, size):
+    # URL of a square thumbnail of the stored image, made on first request
+    pixels = settings.AVATAR_THUMBNAIL_SIZES[size]
+    storage = image_field.storage or default_storage
+    name = thumbnail_name(image_field.name, pixels)
+    if not storage.exists(name):
+        try:
+            with storage.open(image_field.name) as original, Image.open(original) as image:
+                image = ImageOps.exif_transpose(image)
+                thumbnail = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+                name = storage.save(name, ContentFile(_encode(thumbnail)))
+        except (OSError, ValueError):
+            # Missing or unreadable original, serve it as it is
+            return image_field.url
+    return storage.url(name)
@@ -0,0 +1,142 @@
+import codecs
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+
+from .bulk import create_bulk
+from .forms import TaskForm
+from .models import Task
+
+
+# Bulk task import. Rows are read one at a time from CSV or NDJSON, checked
+# with TaskForm's field rules and written with bulk_create in batches, one
+# INSERT per batch instead of one per task. Invalid rows are skipped and
+# reported with their line number.
+#
+# The fields of a single TaskForm are reused for every row: building a
+# form per row deep-copies all of its fields and costs more than the
+# validation itself.
+FORMATS = ['csv', 'ndjson']
+FALSE_VALUES = {'', '0', 'false', 'no', 'n', 'off'}
+MAX_ERRORS = 100
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.batches = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, errors))
+
+
+def decoded_lines(fileobj):
+    # The lines of a binary UTF-8 file as text, a byte order mark dropped
+    for number, raw in enumerate(fileobj, start=1):
+        if number == 1 and raw.startswith(codecs.BOM_UTF8):
+            raw = raw[len(codecs.BOM_UTF8):]
+        yield raw.decode('utf-8')
+
+
+def read_rows(fileobj, import_format):
+    # Yields (line number, row dict) from a binary file object. A row that
+    # cannot be read comes as {'__error__': message}: an NDJSON line that is
+    # not UTF-8 or not JSON is skipped, a CSV file stops at its first line
+    # that is not UTF-8, the CSV reader has no way to resynchronize.
+    if import_format == 'csv':
+        reader = csv.DictReader(decoded_lines(fileobj))
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except UnicodeDecodeError:
+                yield reader.line_num + 1, {'__error__': 'not UTF-8 text, the rest of the file was not read'}
+                return
+            except csv.Error as e:
+                yield reader.line_num, {'__error__': str(e)}
+                continue
+            yield reader.line_num, row
+    elif import_format == 'ndjson':
+        for line, raw in enumerate(fileobj, start=1):
+            try:
+                raw = raw.decode('utf-8-sig' if line == 1 else 'utf-8')
+            except UnicodeDecodeError:
+                yield line, {'__error__': 'not UTF-8 text'}
+                continue
+            if not raw.strip():
+                continue
+            try:
+                row = json.loads(raw)
+            except ValueError as e:
+                row = {'__error__': str(e)}
+            yield line, row if isinstance(row, dict) else {'__error__': 'not an object'}
+    else:
+        raise ValueError(f'Unknown import format: {import_format}')
+
+
+def form_data(row):
+    # CSV gives strings for everything, NDJSON real booleans and nulls
+    data = {field: row.get(field) for field in TaskForm.Meta.fields}
+    complete = data['complete']
+    if isinstance(complete, str):
+        complete = complete.strip().lower() not in FALSE_VALUES
+    data['complete'] = bool(complete)
+    return {field: value for field, value in data.items() if value is not None}
+
+
+class RowValidator:
+    def __init__(self):
+        self.fields = TaskForm().fields
+
+    # Returns (cleaned data, errors), read the way a TaskForm reads a POST
+    def clean(self, row):
+        data = form_data(row)
+        # A POST only has strings, the form fields would fail on a number
+        # or a list from NDJSON
+        errors = {field: ['Enter a string or null.'] for field, value in data.items()
+                  if field != 'complete' and not isinstance(value, str)}
+        if errors:
+            return {}, errors
+        cleaned = {}
+        for name, field in self.fields.items():
+            try:
+                cleaned[name] = field.clean(field.widget.value_from_datadict(data, {}, name))
+            except ValidationError as e:
+                errors[name] = e.messages
+        return cleaned, errors
+
+
+def import_tasks(user, rows, batch_size=1000, progress=None):
+    # progress(result) is called after every batch that was written
+    result = ImportResult()
+    validator = RowValidator()
+    batch = []
+    for line, row in rows:
+        if '__error__' in row:
+            result.add_error(line, {'__all__': [row['__error__']]})
+            continue
+        cleaned, errors = validator.clean(row)
+        if errors:
+            result.add_error(line, errors)
+            continue
+        batch.append(Task(user=user, **cleaned))
+        if len(batch) >= batch_size:
+            _write_batch(user, batch, result, progress)
+            batch = []
+    if batch:
+        _write_batch(user, batch, result, progress)
+    return result
+
+
+def _write_batch(user, batch, result, progress):
+    create_bulk(user.id, batch)
+    result.created += len(batch)
+    result.batches += 1
+    if progress:
+        progress(result)
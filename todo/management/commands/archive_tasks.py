@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.archive import archivable, archive_completed
+
+
+class Command(BaseCommand):
+    help = ('Move tasks completed more than --days days ago to the archive, in batches. '
+            'Run it from cron, or keep it running with --every.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TODO_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--user', action='append', dest='users', metavar='USERNAME',
+                            help='Only this user, may be repeated')
+        parser.add_argument('--dry-run', action='store_true', help='Count the tasks without moving them')
+        parser.add_argument('--every', type=float, help='Archive again every this many seconds, until stopped')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['users']:
+            users = list(User.objects.filter(username__in=options['users']))
+            if len(users) != len(set(options['users'])):
+                raise CommandError('Unknown user in --user')
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative')
+
+        if options['dry_run']:
+            tasks = archivable(options['days'])
+            if users is not None:
+                tasks = tasks.filter(user__in=users)
+            self.stdout.write(f'{tasks.count()} tasks would be archived')
+            return
+
+        def progress(archived):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{archived} archived')
+
+        while True:
+            start = time.perf_counter()
+            archived = archive_completed(options['days'], options['batch_size'], users, progress)
+            self.stdout.write(self.style.SUCCESS(
+                f'{archived} tasks archived in {time.perf_counter() - start:.1f}s'
+            ))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
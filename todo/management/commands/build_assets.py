@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.assets import BUNDLES, write_bundles
+from todo.storage import brotli
+
+
+class Command(BaseCommand):
+    help = 'Bundle and minify the CSS and JS, then collect static files with hashed, precompressed names'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-collect', action='store_true',
+                            help='Only write the bundles to ASSETS_ROOT, skip collectstatic')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = write_bundles()
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        for name, size in sizes.items():
+            self.stdout.write(f'{name}: {len(BUNDLES[name])} files, {size / 1024:.0f} KB')
+        if options['no_collect']:
+            return
+
+        if brotli is None:
+            self.stderr.write('brotli is not installed, only .gz variants are written')
+        call_command('collectstatic', interactive=False, verbosity=options['verbosity'] - 1)
+        self.stdout.write(self.style.SUCCESS(f'Static files collected into {settings.STATIC_ROOT}'))
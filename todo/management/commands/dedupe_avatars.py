@@ -0,0 +1,67 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todo.images import thumbnail_name
+from todo.models import Profile
+from todo.storage import content_hash, hashed_name, is_hashed
+
+
+class Command(BaseCommand):
+    help = 'Rename uploaded avatars to their content hash, merging byte-identical copies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--folder', default='profile_pics', help='Folder under MEDIA_ROOT to scan')
+        parser.add_argument('--dry-run', action='store_true', help='Report without changing anything')
+        parser.add_argument('--delete-orphans', action='store_true',
+                            help='Also delete files no profile refers to, see sweep_avatars')
+
+    def handle(self, *args, **options):
+        storage = Profile._meta.get_field('image').storage
+        folder = options['folder']
+        dry_run = options['dry_run']
+        merged = renamed = freed = 0
+        seen = set()
+
+        _, files = storage.listdir(folder)
+        for filename in sorted(files):
+            name = os.path.join(folder, filename)
+            if is_hashed(name):
+                continue
+            with storage.open(name) as content:
+                target = hashed_name(name, content_hash(content))
+            size = storage.size(name)
+            duplicate = target in seen or storage.exists(target)
+            seen.add(target)
+
+            if duplicate:
+                merged += 1
+                freed += size
+                self.stdout.write(f'{name} -> {target} (duplicate)')
+            else:
+                renamed += 1
+                self.stdout.write(f'{name} -> {target}')
+            if dry_run:
+                continue
+
+            if duplicate:
+                storage.delete(name)
+            else:
+                os.replace(storage.path(name), storage.path(target))
+            Profile.objects.filter(image=name).update(image=target, updated_at=timezone.now())
+            # Thumbnails of the old name, the new one gets its own
+            for pixels in settings.AVATAR_THUMBNAIL_SIZES.values():
+                storage.delete(thumbnail_name(name, pixels))
+
+        if options['delete_orphans'] and not dry_run:
+            for name in storage.unreferenced(folder, settings.AVATAR_SWEEP_GRACE):
+                freed += storage.size(name)
+                storage.delete(name)
+                self.stdout.write(f'{name} deleted (unused)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{renamed} renamed, {merged} duplicates merged, {freed / 1024:.0f} KB freed'
+            + (' (dry run)' if dry_run else '')
+        ))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.synthetic import TaskDistribution, generate, parse_range
+
+
+class Command(BaseCommand):
+    help = 'Create synthetic users and tasks for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--tasks', default='100', help='Tasks per user, "N" or "MIN-MAX"')
+        parser.add_argument('--complete-ratio', type=float, default=0.3,
+                            help='Share of tasks that are complete, 0 to 1')
+        parser.add_argument('--date-spread', type=int, default=90,
+                            help='Due dates fall up to this many days before or after today')
+        parser.add_argument('--description-length', default='0-200',
+                            help='Description length in characters, "N" or "MIN-MAX"')
+        parser.add_argument('--prefix', default='loaduser', help='Username prefix')
+        parser.add_argument('--password', default='loadtest-pass', help='Password of every user')
+        parser.add_argument('--seed', type=int, help='Random seed, for the same data on every run')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            distribution = TaskDistribution(
+                tasks=parse_range(options['tasks']),
+                complete_ratio=options['complete_ratio'],
+                date_spread=options['date_spread'],
+                description_length=parse_range(options['description_length']),
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        if not 0 <= options['complete_ratio'] <= 1:
+            raise CommandError('--complete-ratio must be between 0 and 1')
+
+        def progress(user, count):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{user.username}: {count} tasks')
+
+        start = time.perf_counter()
+        users, tasks = generate(
+            options['users'], distribution, prefix=options['prefix'], password=options['password'],
+            seed=options['seed'], batch_size=options['batch_size'], progress=progress,
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(users)} users and {tasks} tasks created in {elapsed:.1f}s'
+            + (f' ({users[0].username} to {users[-1].username})' if users else '')
+        ))
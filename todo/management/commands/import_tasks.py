@@ -0,0 +1,37 @@
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.importer import FORMATS, import_tasks, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import tasks for a user from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='File format, guessed from the extension by default')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'No user named {options["username"]}')
+        import_format = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if import_format not in FORMATS:
+            raise CommandError(f'Cannot tell the format of {options["path"]}, pass --format')
+
+        def progress(result):
+            self.stdout.write(f'batch {result.batches}: {result.created} created, {result.skipped} skipped')
+
+        with open(options['path'], 'rb') as f:
+            result = import_tasks(user, read_rows(f, import_format), options['batch_size'], progress)
+
+        for line, errors in result.errors:
+            messages = '; '.join(f'{field}: {" ".join(msgs)}' for field, msgs in errors.items())
+            self.stderr.write(f'line {line}: {messages}')
+        self.stdout.write(self.style.SUCCESS(f'{result.created} tasks imported, {result.skipped} skipped'))
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+# Engines that keep sessions in the django_session table
+DATABASE_ENGINES = ['django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db']
+
+
+class Command(BaseCommand):
+    help = ('Delete expired sessions in small batches, so the table is never locked for long. '
+            'Run it from cron, or keep it running with --every.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to wait between batches')
+        parser.add_argument('--every', type=float, help='Purge again every this many seconds, until stopped')
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE not in DATABASE_ENGINES:
+            self.stdout.write(f'{settings.SESSION_ENGINE} keeps no sessions in the database, nothing to purge')
+            return
+        while True:
+            deleted = self.purge(options['batch_size'], options['pause'])
+            self.stdout.write(self.style.SUCCESS(f'{deleted} expired sessions deleted'))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
+
+    def purge(self, batch_size, pause):
+        deleted = 0
+        now = timezone.now()
+        while True:
+            keys = list(Session.objects.filter(expire_date__lt=now)
+                        .values_list('session_key', flat=True)[:batch_size])
+            if not keys:
+                return deleted
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            if len(keys) < batch_size:
+                return deleted
+            time.sleep(pause)
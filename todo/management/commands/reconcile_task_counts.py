@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from todo.counters import drifted, reconcile
+from todo.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Recount every profile's open and total tasks and repair the ones that drifted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', metavar='USERNAME',
+                            help='Only this user, may be repeated')
+        parser.add_argument('--dry-run', action='store_true', help='Report the drift without repairing it')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.select_related('user')
+        if options['users']:
+            profiles = profiles.filter(user__username__in=options['users'])
+
+        found = list(drifted(profiles).order_by('user__username'))
+        for profile in found:
+            self.stdout.write(
+                f'{profile.user.username}: open {profile.open_count} -> {profile.actual_open}, '
+                f'total {profile.total_count} -> {profile.actual_total}'
+            )
+        if options['dry_run']:
+            self.stdout.write(f'{len(found)} profiles drifted')
+            return
+        repaired = reconcile(profiles)
+        self.stdout.write(self.style.SUCCESS(f'{repaired} profiles repaired'))
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from todo.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Delete avatars and thumbnails no profile refers to anymore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--folder', default='profile_pics', help='Folder under MEDIA_ROOT to scan')
+        parser.add_argument('--grace', type=int, default=settings.AVATAR_SWEEP_GRACE,
+                            help='Keep files written or reused less than this many seconds ago')
+        parser.add_argument('--dry-run', action='store_true', help='Report without deleting anything')
+
+    def handle(self, *args, **options):
+        storage = Profile._meta.get_field('image').storage
+        freed = 0
+        unused = storage.unreferenced(options['folder'], options['grace'])
+        for name in unused:
+            freed += storage.size(name)
+            self.stdout.write(f'{name} deleted (unused)')
+            if not options['dry_run']:
+                storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(unused)} files, {freed / 1024:.0f} KB freed' + (' (dry run)' if options['dry_run'] else '')
+        ))
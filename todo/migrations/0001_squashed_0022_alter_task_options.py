@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:46
+#
+# The schema 0001-0022 end up with, for new databases. Some of those
+# migrations give a foreign key or the primary key a string default and
+# cannot run against an empty database; existing databases keep the
+# history they have recorded.
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    replaces = [
+        ('todo', '0001_initial'),
+        ('todo', '0002_remove_task_create_task_date_task_date_time_and_more'),
+        ('todo', '0003_remove_task_date_remove_task_date_time_and_more'),
+        ('todo', '0004_remove_task_create'),
+        ('todo', '0005_profile'),
+        ('todo', '0006_alter_profile_image'),
+        ('todo', '0007_task_deadline'),
+        ('todo', '0008_remove_task_deadline_task_date'),
+        ('todo', '0009_alter_task_user'),
+        ('todo', '0010_alter_task_user'),
+        ('todo', '0011_alter_task_user'),
+        ('todo', '0012_alter_task_user'),
+        ('todo', '0013_alter_task_user'),
+        ('todo', '0014_remove_task_id_alter_task_user'),
+        ('todo', '0015_task_id_alter_task_user'),
+        ('todo', '0016_alter_task_user'),
+        ('todo', '0017_alter_task_user'),
+        ('todo', '0018_alter_task_user'),
+        ('todo', '0019_alter_task_date'),
+        ('todo', '0020_alter_task_date_alter_task_user'),
+        ('todo', '0021_alter_task_date'),
+        ('todo', '0022_alter_task_options'),
+    ]
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(default='default.png', upload_to='profile_pics')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('complete', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('date', models.DateField(blank=True, default=datetime.date(2023, 12, 10), null=True)),
+            ],
+            options={
+                'ordering': ['complete', 'date'],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:27
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0022_alter_task_options'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='task',
+            options={'ordering': ['complete', 'date', 'id']},
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='date',
+            field=models.DateField(blank=True, default=datetime.date(2026, 10, 18), null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'complete', 'date', 'id'], name='task_user_complete_date_idx'),
+        ),
+    ]
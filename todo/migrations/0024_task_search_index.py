@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+# Full-text index for todo.search: an FTS5 table on SQLite, a generated
+# tsvector column with a GIN index on Postgres. Other databases fall back
+# to substring search and need nothing here.
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS todo_task_fts "
+            "USING fts5(title, description, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO todo_task_fts (rowid, title, description) "
+            "SELECT id, title, COALESCE(description, '') FROM todo_task"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE todo_task ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', COALESCE(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', COALESCE(description, '')), 'B')) STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX todo_task_search_vector_idx ON todo_task USING GIN (search_vector)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS todo_task_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE todo_task DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0023_task_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
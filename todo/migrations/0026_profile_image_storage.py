@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:35
+
+from django.db import migrations, models
+import todo.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0025_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='image',
+            field=models.ImageField(default='default.png', storage=todo.storage.avatar_storage, upload_to='profile_pics'),
+        ),
+    ]
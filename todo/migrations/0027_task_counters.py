@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+# Fill the new counters from the existing tasks (todo.counters keeps them
+# up to date from here on)
+def count_tasks(apps, schema_editor):
+    Profile = apps.get_model('todo', 'Profile')
+    Task = apps.get_model('todo', 'Task')
+
+    def counted(**filters):
+        tasks = (Task.objects.filter(user=OuterRef('user'), **filters).order_by()
+                 .values('user').annotate(n=Count('id')).values('n'))
+        return Coalesce(Subquery(tasks), 0)
+
+    Profile.objects.update(open_count=counted(complete=False), total_count=counted())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0026_profile_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='open_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='total_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_tasks, migrations.RunPython.noop),
+    ]
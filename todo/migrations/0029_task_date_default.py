@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:46
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0028_archived_task'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='date',
+            field=models.DateField(blank=True, default=datetime.date.today, null=True),
+        ),
+    ]
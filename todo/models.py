@@ -2,25 +2,68 @@ from django.db import models
 from django.contrib.auth.models import User
 import datetime
 
+from .storage import avatar_storage
+
 # model for database
 class Task(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     description = models.TextField(null=True, blank=True)
     complete = models.BooleanField(default=False)
-    date = models.DateField(default=datetime.date.today(), null=True, blank=True)
+    date = models.DateField(default=datetime.date.today, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return self.title
+    
+    # Remember "complete" as loaded, signals.count_task moves the profile's
+    # counters when a save changes it
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        task = super().from_db(db, field_names, values)
+        task._loaded_complete = task.__dict__.get('complete')
+        return task
+    
+    # Set the order base on "complete" value, "id" keeps the order stable
+    # for keyset pagination
+    class Meta:
+        ordering = ['complete', 'date', 'id']
+        indexes = [
+            models.Index(fields=['user', 'complete', 'date', 'id'], name='task_user_complete_date_idx'),
+        ]
+
+
+# Cold storage for tasks completed long ago (todo.archive), so todo_task only
+# holds what the task list shows. A task keeps its id here and gets it
+# back when it is restored.
+class ArchivedTask(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    title = models.CharField(max_length=200)
+    description = models.TextField(null=True, blank=True)
+    complete = models.BooleanField(default=True)
+    date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return self.title
     
-    # Set the order base on "complete" value
+    # Most recently completed first
     class Meta:
-        ordering = ['complete', 'date']
+        ordering = ['-updated_at', '-id']
+        indexes = [
+            models.Index(fields=['user', '-updated_at', '-id'], name='archived_user_updated_idx'),
+        ]
         
         
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    image = models.ImageField(default='default.png', upload_to='profile_pics')
+    image = models.ImageField(default='default.png', upload_to='profile_pics', storage=avatar_storage)
+    updated_at = models.DateTimeField(auto_now=True)
+    # The user's tasks, kept up to date by todo.counters
+    open_count = models.IntegerField(default=0)
+    total_count = models.IntegerField(default=0)
     
     def __str__(self):
         return f'{self.user.username} Profile'
\ No newline at end of file
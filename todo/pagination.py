@@ -0,0 +1,114 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+
+
+# Keyset (cursor) pagination. Instead of OFFSET, each page seeks past the
+# last row of the previous one, so page N costs the same as page 1. The
+# default ordering is Task.Meta.ordering = (complete, date, id), which is
+# served by the (user, complete, date, id) index.
+DEFAULT_ORDERING = ('complete', 'date', 'id')
+
+
+def encode_cursor(row, ordering):
+    values = []
+    for field in ordering:
+        # Model instances and .values() dicts both work
+        name = field.lstrip('-')
+        value = row[name] if isinstance(row, dict) else getattr(row, name)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        values.append(value)
+    raw = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def key_fields(queryset, ordering):
+    # The model field, or annotation (search rank), behind each ordering key
+    annotations = queryset.query.annotations
+    return [
+        annotations[name].output_field if name in annotations else queryset.model._meta.get_field(name)
+        for name in (field.lstrip('-') for field in ordering)
+    ]
+
+
+def _key_value(field, value):
+    if value is None:
+        if not field.null:
+            raise ValueError(f'{field.name} cannot be null')
+        return None
+    if isinstance(value, (dict, list)):
+        raise TypeError(f'{field.name} cannot be a {type(value).__name__}')
+    return field.to_python(value)
+
+
+def decode_cursor(cursor, fields):
+    # Returns the list of key values, each converted to its field's type, or
+    # None for a missing / broken cursor: the client gets the first page
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(fields):
+            return None
+        return [_key_value(field, value) for field, value in zip(fields, values)]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def _beyond(name, value, descending, nulls_largest):
+    # Rows whose `name` sorts strictly after `value`. NULLs sort as the
+    # largest value on Postgres and the smallest on SQLite, follow whatever
+    # the backend does so the seek matches its ORDER BY.
+    nulls_after = nulls_largest != descending
+    if value is None:
+        return Q(**{f'{name}__isnull': False}) if not nulls_after else Q(pk__in=[])
+    beyond = Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+    if nulls_after:
+        beyond |= Q(**{f'{name}__isnull': True})
+    return beyond
+
+
+def _same(name, value):
+    return Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+
+
+def seek(queryset, cursor, ordering=DEFAULT_ORDERING):
+    # Filter the queryset to the rows that come after the cursor
+    values = decode_cursor(cursor, key_fields(queryset, ordering))
+    if values is None:
+        return queryset
+    nulls_largest = connections[queryset.db].features.nulls_order_largest
+    after = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        after |= equal & _beyond(name, value, field.startswith('-'), nulls_largest)
+        equal &= _same(name, value)
+    return queryset.filter(after)
+
+
+def paginate(queryset, cursor, page_size, ordering=DEFAULT_ORDERING):
+    # Returns (rows, next_cursor); next_cursor is None on the last page
+    queryset = queryset.order_by(*ordering)
+    rows = list(seek(queryset, cursor, ordering)[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1], ordering)
+    return rows, next_cursor
+
+
+async def apaginate(queryset, cursor, page_size, ordering=DEFAULT_ORDERING):
+    # paginate() for async views, the rows come from async iteration
+    queryset = queryset.order_by(*ordering)
+    rows = [row async for row in seek(queryset, cursor, ordering)[:page_size + 1]]
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1], ordering)
+    return rows, next_cursor
@@ -0,0 +1,181 @@
+import collections
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger('todo.perf')
+
+
+# Per-request performance numbers: wall time, query count and time (from
+# an execute wrapper on every connection, see signals.record_queries),
+# template render time and response size. They go out as a Server-Timing header and a JSON log line
+# on the todo.perf logger, and into a rolling window per URL name that
+# views.perf_stats reports percentiles over.
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+
+
+current = contextvars.ContextVar('request_metrics', default=None)
+
+
+# Installed on each connection as it connects, in whatever thread it lives:
+# under ASGI the ORM runs in another thread than the middleware, the
+# request is found through the context variable
+def record_query(execute, sql, params, many, context):
+    metrics = current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_time += time.perf_counter() - start
+
+
+# Template backend that adds the time spent in render() to the request.
+# Only the outermost render counts, a template rendered from inside another
+# one (render_to_string in a tag) is already part of its time.
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = current.get()
+        if metrics is None or metrics.rendering:
+            return self.template.render(context, request)
+        metrics.rendering = True
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+            metrics.rendering = False
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+# Rolling window of samples per URL name: the last PERF_WINDOW_SAMPLES
+# requests, no older than PERF_WINDOW_SECONDS
+Sample = collections.namedtuple('Sample', 'at total db queries template size')
+_samples = collections.defaultdict(lambda: collections.deque(maxlen=settings.PERF_WINDOW_SAMPLES))
+_lock = threading.Lock()
+
+
+def add_sample(url_name, sample):
+    with _lock:
+        _samples[url_name].append(sample)
+
+
+def clear_samples():
+    with _lock:
+        _samples.clear()
+
+
+def percentile(values, q):
+    # Nearest-rank percentile of a sorted list
+    return values[min(len(values) - 1, max(0, int(round(q * len(values))) - 1))]
+
+
+def summary(now=None):
+    # {url name: {'count': n, field: {'p50', 'p95', 'p99', 'max'}}}
+    cutoff = (now or time.time()) - settings.PERF_WINDOW_SECONDS
+    with _lock:
+        windows = {name: [s for s in samples if s.at >= cutoff] for name, samples in _samples.items()}
+    report = {}
+    for name, samples in sorted(windows.items()):
+        if not samples:
+            continue
+        report[name] = {'count': len(samples)}
+        for field in ['total', 'db', 'queries', 'template', 'size']:
+            values = sorted(getattr(s, field) for s in samples if getattr(s, field) is not None)
+            if values:
+                report[name][field] = {
+                    'p50': percentile(values, 0.50), 'p95': percentile(values, 0.95),
+                    'p99': percentile(values, 0.99), 'max': values[-1],
+                }
+    return report
+
+
+def response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+def server_timing(metrics):
+    return ', '.join([
+        f'total;dur={metrics.total * 1000:.1f}',
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+        f'tpl;dur={metrics.template_time * 1000:.1f}',
+    ])
+
+
+def finish(request, response, metrics):
+    metrics.total = time.perf_counter() - metrics.start
+    match = request.resolver_match
+    url_name = match.url_name if match and match.url_name else 'unresolved'
+    size = response_size(response)
+    response['Server-Timing'] = server_timing(metrics)
+
+    if url_name not in settings.PERF_IGNORE_URL_NAMES:
+        add_sample(url_name, Sample(
+            time.time(), metrics.total * 1000, metrics.db_time * 1000,
+            metrics.queries, metrics.template_time * 1000, size,
+        ))
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({
+            'method': request.method, 'path': request.path, 'url_name': url_name,
+            'status': response.status_code, 'total_ms': round(metrics.total * 1000, 2),
+            'db_ms': round(metrics.db_time * 1000, 2), 'queries': metrics.queries,
+            'template_ms': round(metrics.template_time * 1000, 2), 'bytes': size,
+        }))
+    return response
+
+
+@contextlib.contextmanager
+def measure():
+    metrics = RequestMetrics()
+    token = current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        current.reset(token)
+
+
+@sync_and_async_middleware
+def performance_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with measure() as metrics:
+                response = await get_response(request)
+            return finish(request, response, metrics)
+    else:
+        def middleware(request):
+            with measure() as metrics:
+                response = get_response(request)
+            return finish(request, response, metrics)
+    return middleware
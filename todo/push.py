@@ -0,0 +1,93 @@
+import asyncio
+from http.cookies import SimpleCookie
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http import HttpRequest
+
+from .events import get_backend
+
+
+# Server-sent event stream of the logged-in user's task changes
+# (todo.events), mounted in front of Django by todoapp/asgi.py at
+# settings.TODO_EVENTS_PATH. It is a bare ASGI app rather than a view: an
+# open stream holds no request, middleware or response objects, and it
+# reads the client's disconnect to drop its subscription, which a Django
+# streaming response does not. A comment line goes out after
+# TODO_EVENTS_HEARTBEAT quiet seconds so proxies keep the connection open.
+
+def session_user_id(session_key):
+    # The session's user id, checked like AuthenticationMiddleware does
+    close_old_connections()
+    try:
+        request = HttpRequest()
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        user = get_user(request)
+        return user.id if user.is_authenticated else None
+    finally:
+        close_old_connections()
+
+
+def session_key(scope):
+    cookie = SimpleCookie()
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            cookie.load(value.decode('latin-1'))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    return morsel.value if morsel else None
+
+
+HEARTBEAT = b': heartbeat\n\n'
+
+
+async def wait_for_disconnect(receive, subscription):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    subscription.stop()
+
+
+def heartbeat(subscription, interval):
+    # One TimerHandle per stream rather than a timeout on every read
+    if subscription.queue.empty():
+        subscription.queue.put_nowait(HEARTBEAT)
+    subscription.timer = subscription.loop.call_later(interval, heartbeat, subscription, interval)
+
+
+async def event_stream(scope, receive, send):
+    key = session_key(scope)
+    user_id = key and await sync_to_async(session_user_id)(key)
+    if not user_id:
+        await send({'type': 'http.response.start', 'status': 401,
+                    'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'Login required'})
+        return
+
+    subscription = get_backend().subscribe(user_id)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive, subscription))
+    interval = settings.TODO_EVENTS_HEARTBEAT
+    subscription.timer = subscription.loop.call_later(interval, heartbeat, subscription, interval)
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+        while (body := await subscription.get()) is not None:
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        subscription.close()
+        subscription.timer.cancel()
+        disconnected.cancel()
+
+
+def with_event_stream(application):
+    # The ASGI application with the event stream mounted in front of it
+    async def app(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == settings.TODO_EVENTS_PATH:
+            return await event_stream(scope, receive, send)
+        return await application(scope, receive, send)
+    return app
@@ -0,0 +1,217 @@
+import contextvars
+import functools
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger('todo.replicas')
+
+
+# Read/write split over the replicas in settings.TODO_DB_REPLICAS. Every
+# query goes to the primary ('default') unless the view is wrapped in
+# replica_reads: then the reads of a GET or HEAD request go to one replica,
+# picked for the whole request. Writes always go to the primary, and once a
+# request has written its reads follow, so it reads what it wrote.
+#
+# Read-your-writes across requests: the response to a request that wrote
+# sets a cookie for TODO_DB_STICKY_SECONDS, during which the browser's
+# requests read from the primary too. Lag: a replica whose replay is more
+# than TODO_DB_MAX_REPLICA_LAG seconds behind, or that cannot be reached,
+# is left out until the next check; with none left reads use the primary.
+
+class Route:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica = None
+        self.wrote = False
+
+
+current = contextvars.ContextVar('db_route', default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        route = current.get()
+        if route is None or route.wrote:
+            return None
+        return route.replica
+
+    def db_for_write(self, model, **hints):
+        route = current.get()
+        if route is not None:
+            route.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        aliases = {'default', *settings.TODO_DB_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+# Replication lag in seconds, or None when the replica is unreachable. A
+# Postgres standby reports how far its replay is behind (0 when it has
+# replayed all it received); a database that is not a standby, such as a
+# second Postgres database or a copied SQLite file standing in for one,
+# has no lag to report.
+POSTGRES_LAG = '''
+    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END
+'''
+
+
+def measure_lag(alias):
+    connection = connections[alias]
+    if connection.vendor == 'sqlite':
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRES_LAG if connection.vendor == 'postgresql' else 'SELECT 1')
+            lag = cursor.fetchone()[0] if connection.vendor == 'postgresql' else 0
+        return float(lag or 0)
+    except DatabaseError:
+        logger.warning('Replica %s is unreachable', alias, exc_info=True)
+        return None
+
+
+# Last lag per replica and when it was measured, per process
+_lags = {}
+_lock = threading.Lock()
+
+
+def replica_lag(alias, now=None):
+    now = time.monotonic() if now is None else now
+    with _lock:
+        checked = _lags.get(alias)
+    if checked is not None and now - checked[0] < settings.TODO_DB_LAG_CHECK_INTERVAL:
+        return checked[1]
+    lag = measure_lag(alias)
+    with _lock:
+        _lags[alias] = (now, lag)
+    return lag
+
+
+def forget_lags():
+    with _lock:
+        _lags.clear()
+
+
+def healthy_replicas():
+    return [
+        alias for alias in settings.TODO_DB_REPLICAS
+        if (lag := replica_lag(alias)) is not None and lag <= settings.TODO_DB_MAX_REPLICA_LAG
+    ]
+
+
+def pick_replica():
+    replicas = healthy_replicas()
+    return random.choice(replicas) if replicas else None
+
+
+_done = object()
+
+
+def routed_stream(chunks, route):
+    # A streamed body is produced after the view and the middleware have
+    # returned, each chunk is read with the request's route back in place
+    chunks = iter(chunks)
+    while True:
+        token = current.set(route)
+        try:
+            chunk = next(chunks, _done)
+        finally:
+            current.reset(token)
+        if chunk is _done:
+            return
+        yield chunk
+
+
+async def arouted_stream(chunks, route):
+    # routed_stream for the async iterator of an async view's response
+    chunks = aiter(chunks)
+    while True:
+        token = current.set(route)
+        try:
+            chunk = await anext(chunks, _done)
+        finally:
+            current.reset(token)
+        if chunk is _done:
+            return
+        yield chunk
+
+
+def route_stream(response, route):
+    if route.replica and response.streaming:
+        stream = arouted_stream if response.is_async else routed_stream
+        response.streaming_content = stream(response.streaming_content, route)
+    return response
+
+
+def reads_replica(request):
+    # The request's route, when its reads can go to a replica
+    route = current.get()
+    if route is None or route.pinned or request.method not in ('GET', 'HEAD'):
+        return None
+    return route
+
+
+# For views that only read: their GET and HEAD requests read from a replica.
+# The ORM calls of an async view run in threads (sync_to_async) that copy
+# the request's context, so they see the route set here.
+def replica_reads(view):
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            route = reads_replica(request)
+            if route is None:
+                return await view(request, *args, **kwargs)
+            route.replica = await sync_to_async(pick_replica)()
+            return route_stream(await view(request, *args, **kwargs), route)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            route = reads_replica(request)
+            if route is None:
+                return view(request, *args, **kwargs)
+            route.replica = pick_replica()
+            return route_stream(view(request, *args, **kwargs), route)
+    return wrapper
+
+
+def begin(request):
+    return current.set(Route(pinned=settings.TODO_DB_STICKY_COOKIE in request.COOKIES))
+
+
+def finish(response, route):
+    if route.wrote and settings.TODO_DB_REPLICAS:
+        response.set_cookie(settings.TODO_DB_STICKY_COOKIE, '1', max_age=settings.TODO_DB_STICKY_SECONDS,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = begin(request)
+            try:
+                response = await get_response(request)
+                return finish(response, current.get())
+            finally:
+                current.reset(token)
+    else:
+        def middleware(request):
+            token = begin(request)
+            try:
+                response = get_response(request)
+                return finish(response, current.get())
+            finally:
+                current.reset(token)
+    return middleware
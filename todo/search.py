@@ -0,0 +1,126 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+# Full-text search for tasks. Each backend filters a Task queryset down to
+# the matches of a user query and annotates them with a `rank` (higher is
+# more relevant). The backend is picked from the database vendor, or from
+# settings.TODO_SEARCH_BACKEND (a dotted path) when it is set.
+
+class SearchBackend:
+    # Keep the index in step with a saved task
+    def index(self, task):
+        pass
+
+    # Index tasks that were written without save(), e.g. bulk_create
+    def index_ids(self, task_ids):
+        pass
+
+    # Drop deleted tasks from the index
+    def remove(self, task_ids):
+        pass
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+
+# Plain substring match on title and description, for other databases
+class ContainsSearch(SearchBackend):
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(title__icontains=query) | Q(description__icontains=query)
+        ).annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+# SQLite FTS5 virtual table todo_task_fts(rowid = task id, title, description)
+class SQLiteFTSSearch(SearchBackend):
+    table = 'todo_task_fts'
+
+    def index(self, task):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [task.id])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, description) VALUES (%s, %s, %s)',
+                [task.id, task.title, task.description or ''],
+            )
+
+    def index_ids(self, task_ids):
+        self.remove(task_ids)
+        self._chunked(
+            f'INSERT INTO {self.table} (rowid, title, description) '
+            f"SELECT id, title, COALESCE(description, '') FROM todo_task WHERE id IN ({{ids}})",
+            task_ids,
+        )
+
+    def remove(self, task_ids):
+        self._chunked(f'DELETE FROM {self.table} WHERE rowid IN ({{ids}})', task_ids)
+
+    def _chunked(self, sql, task_ids):
+        task_ids = list(task_ids)
+        with connection.cursor() as cursor:
+            # Stay under SQLite's limit on bound parameters
+            for start in range(0, len(task_ids), 500):
+                chunk = task_ids[start:start + 500]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(sql.format(ids=placeholders), chunk)
+
+    # Turn free text into an FTS5 expression: every word must match, the
+    # last one as a prefix so results show up while the user is typing
+    def match_expression(self, query):
+        words = re.findall(r'\w+', query)
+        if not words:
+            return None
+        terms = ['"%s"' % word for word in words]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if expression is None:
+            return queryset.none()
+        # bm25() is lower for better matches, flip it so higher ranks first
+        rank = RawSQL(
+            f'SELECT -bm25({self.table}, 10.0, 1.0) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s AND rowid = "todo_task"."id"',
+            [expression], output_field=FloatField(),
+        )
+        matches = RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [expression])
+        return queryset.filter(id__in=matches).annotate(rank=rank)
+
+
+# Postgres generated tsvector column todo_task.search_vector with a GIN
+# index. The database keeps the column current on every INSERT / UPDATE.
+class PostgresSearch(SearchBackend):
+    def search(self, queryset, query):
+        tsquery = "websearch_to_tsquery('simple', %s)"
+        rank = RawSQL(f'ts_rank("todo_task"."search_vector", {tsquery})', [query], output_field=FloatField())
+        matches = RawSQL(f'"todo_task"."search_vector" @@ {tsquery}', [query], output_field=BooleanField())
+        return queryset.filter(matches).annotate(rank=rank)
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSSearch,
+    'postgresql': PostgresSearch,
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'TODO_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        else:
+            _backend = VENDOR_BACKENDS.get(connection.vendor, ContainsSearch)()
+    return _backend
+
+
+def search_tasks(queryset, query):
+    return get_backend().search(queryset, query)
@@ -1,13 +1,90 @@
-from django.db.models.signals import post_save
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
-from django.dispatch import receiver
+from django.dispatch import receiver, Signal
 from .models import Profile, Task
+from .search import get_backend
+from .auth import forget_user
+from .counters import adjust_task_counts
+from .events import publish_task, publish_bulk
+from .perf import record_query
 
+# Sent by todo.bulk after one statement changed many tasks, which fires no
+# row signals. Arguments: user_id, action, task_ids.
+tasks_bulk_changed = Signal()
+
+# One profile per user, made when the user is. Other User saves (the
+# last_login update on every login) leave the profile alone: writes to it
+# go through userUpdate and todo.counters.
 @receiver(post_save, sender=User)
-def create_profile(sender, instance, created, **kwargs):
-    if created:
-        Profile.objects.create(user = instance)
-        
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.create(user=instance)
+
+# Drop the cached user (todo.auth) and their sidebar (todo.fragments) when
+# the user or their profile is saved, e.g. by userUpdate
 @receiver(post_save, sender=User)
-def create_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def forget_saved_user(sender, instance, **kwargs):
+    forget_user(instance.id)
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def forget_profile_user(sender, instance, **kwargs):
+    forget_user(instance.user_id)
+
+# Keep the full-text search index in sync with tasks
+@receiver(post_save, sender=Task)
+def index_task(sender, instance, **kwargs):
+    get_backend().index(instance)
+
+@receiver(post_delete, sender=Task)
+def unindex_task(sender, instance, **kwargs):
+    get_backend().remove([instance.id])
+
+@receiver(tasks_bulk_changed)
+def index_bulk_changed(sender, user_id, action, task_ids, **kwargs):
+    if action == 'create':
+        get_backend().index_ids(task_ids)
+    elif action == 'delete':
+        get_backend().remove(task_ids)
+
+# Task counters on the profile (todo.counters), the bulk writers move them
+# themselves. Every save goes through, with no delta when "complete" did
+# not change: it also moves the profile's updated_at, the task list's
+# Last-Modified (conditional.py).
+@receiver(post_save, sender=Task)
+def count_task(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_complete', None)
+    instance._loaded_complete = instance.complete
+    if created:
+        adjust_task_counts(instance.user_id, open_delta=0 if instance.complete else 1, total_delta=1)
+    elif loaded is not None and loaded != instance.complete:
+        adjust_task_counts(instance.user_id, open_delta=-1 if instance.complete else 1)
+    else:
+        adjust_task_counts(instance.user_id)
+
+@receiver(post_delete, sender=Task)
+def uncount_task(sender, instance, **kwargs):
+    complete = getattr(instance, '_loaded_complete', None)
+    complete = instance.complete if complete is None else complete
+    adjust_task_counts(instance.user_id, open_delta=0 if complete else -1, total_delta=-1)
+
+# Push task changes to the user's open event streams (todo.events)
+@receiver(post_save, sender=Task)
+def push_task_saved(sender, instance, created, **kwargs):
+    publish_task('created' if created else 'updated', instance)
+
+@receiver(post_delete, sender=Task)
+def push_task_deleted(sender, instance, **kwargs):
+    publish_task('deleted', instance)
+
+@receiver(tasks_bulk_changed)
+def push_bulk_changed(sender, user_id, action, task_ids, **kwargs):
+    publish_bulk(user_id, action, task_ids)
+
+# Time queries for todo.perf. First in the list, so the wrappers pushed and
+# popped by connection.execute_wrapper() stay on top of it.
+@receiver(connection_created)
+def record_queries(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
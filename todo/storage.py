@@ -0,0 +1,151 @@
+import datetime
+import gzip
+import hashlib
+import os
+import re
+
+from django.apps import apps
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from .images import THUMBNAIL_FOLDER, is_thumbnail
+
+
+# Content-addressed storage for avatars. A file is named after the SHA-256
+# of its bytes, so re-uploading the same picture reuses the stored blob
+# instead of writing another copy with a random suffix. A blob is shared
+# by every Profile that points at it. Nothing is deleted while requests
+# run: a request cannot tell whether another one is about to reuse a blob
+# it sees as unused. manage.py sweep_avatars collects the blobs no profile
+# refers to, and their thumbnails, once they have not been written or
+# reused for AVATAR_SWEEP_GRACE seconds. Thumbnails are named after their
+# hashed original already and keep the name they are saved under.
+HASHED_NAME = re.compile(r'^[0-9a-f]{64}$')
+
+
+def content_hash(content):
+    sha = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        sha.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return sha.hexdigest()
+
+
+def hashed_name(name, digest):
+    folder, filename = os.path.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.join(folder, digest + extension)
+
+
+def is_hashed(name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return bool(HASHED_NAME.match(stem))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def _save(self, name, content):
+        if is_thumbnail(name):
+            return super()._save(name, content)
+        name = hashed_name(name, content_hash(content))
+        # Same bytes, same name: the blob is already there. Its mtime moves
+        # so the sweep leaves it alone until the profile points at it.
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+    # Hashed blobs in folder that no profile refers to and that were last
+    # written or reused before the grace period, plus the thumbnails of any
+    # original that is not kept. Shared files such as default.png stay.
+    def unreferenced(self, folder, grace):
+        Profile = apps.get_model('todo', 'Profile')
+        if not self.exists(folder):
+            return []
+        cutoff = timezone.now() - datetime.timedelta(seconds=grace)
+        referenced = set(Profile.objects.values_list('image', flat=True))
+        kept, unused = set(), []
+        for filename in self.listdir(folder)[1]:
+            name = os.path.join(folder, filename)
+            if is_hashed(name) and name not in referenced and self.get_modified_time(name) < cutoff:
+                unused.append(name)
+            else:
+                kept.add(os.path.splitext(filename)[0])
+        thumbs = os.path.join(folder, THUMBNAIL_FOLDER)
+        if self.exists(thumbs):
+            for filename in self.listdir(thumbs)[1]:
+                if os.path.splitext(filename)[0].rsplit('_', 1)[0] not in kept:
+                    unused.append(os.path.join(thumbs, filename))
+        return unused
+
+
+def avatar_storage():
+    return ContentAddressedStorage()
+
+
+# Static files storage: ManifestStaticFilesStorage (hashed names and
+# staticfiles.json) plus precompressed .gz and, with the brotli package
+# installed, .br siblings of every text file, written by collectstatic so
+# no request pays for compression (see todo.assets.serve).
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map', '.ico')
+COMPRESS_MIN_SIZE = 512
+
+
+def compressed_variants(data):
+    # (suffix, bytes) pairs worth keeping, smaller than the original
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    return [(suffix, blob) for suffix, blob in variants if len(blob) < len(data)]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # A file missing from the manifest (collectstatic not run yet, as in
+    # tests) is linked under its plain name instead of failing the page
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def url_converter(self, name, hashed_files, template=None):
+        # Vendor files point at source maps that are not shipped, leave
+        # such references alone instead of aborting collectstatic
+        converter = super().url_converter(name, hashed_files, template)
+
+        def convert(matchobj):
+            try:
+                return converter(matchobj)
+            except ValueError:
+                return matchobj.group(0)
+        return convert
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE) and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+        for suffix, blob in compressed_variants(data):
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(blob))
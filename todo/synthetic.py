@@ -0,0 +1,89 @@
+import datetime
+import random
+import re
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+
+from .bulk import create_bulk
+from .models import Profile, Task
+
+
+# Synthetic users and tasks for load tests and benchmarks. Everything is
+# written with bulk_create: the password is hashed once and shared, the
+# profiles the post_save receiver would make are created alongside, and
+# every task batch goes through bulk.create_bulk, so the counters, the
+# search index and the page cache see it like an import.
+WORDS = (
+    'report invoice meeting review budget design deploy backup refactor email '
+    'call client draft plan release test fix update migrate schedule order '
+    'ship clean read write study train buy pay book prepare renew check'
+).split()
+
+
+class TaskDistribution:
+    def __init__(self, tasks=(50, 50), complete_ratio=0.3, date_spread=90, description_length=(0, 200)):
+        self.tasks = tasks  # (min, max) tasks per user
+        self.complete_ratio = complete_ratio
+        self.date_spread = date_spread  # days before and after today
+        self.description_length = description_length  # (min, max) characters
+
+    def task_count(self, rng):
+        return rng.randint(*self.tasks)
+
+    def task(self, rng, user, today):
+        words = rng.randint(2, 5)
+        length = rng.randint(*self.description_length)
+        description = ''
+        while len(description) < length:
+            description += rng.choice(WORDS) + ' '
+        return Task(
+            user=user,
+            title=' '.join(rng.choice(WORDS) for _ in range(words)).capitalize(),
+            description=description[:length],
+            complete=rng.random() < self.complete_ratio,
+            date=today + datetime.timedelta(days=rng.randint(-self.date_spread, self.date_spread)),
+        )
+
+
+def parse_range(value):
+    # "50" or "10-1000" as a (min, max) tuple
+    low, _, high = str(value).partition('-')
+    low, high = int(low), int(high or low)
+    if low < 0 or high < low:
+        raise ValueError(f'Not a range: {value}')
+    return low, high
+
+
+def next_suffix(prefix):
+    # One past the highest n of the existing prefix<n> users. Counting the
+    # names that start with prefix collides once one of them was deleted or
+    # another user's name merely starts the same way.
+    names = User.objects.filter(username__regex=rf'^{re.escape(prefix)}[0-9]+$').values_list('username', flat=True)
+    return max((int(name[len(prefix):]) + 1 for name in names.iterator()), default=0)
+
+
+def generate(users, distribution, prefix='user', password='password', seed=None,
+             batch_size=5000, progress=None):
+    # Creates users named prefix0, prefix1, ... after any existing ones,
+    # returns (users, tasks created)
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    start = next_suffix(prefix)
+    encoded = make_password(password)
+    created_users = User.objects.bulk_create([
+        User(username=f'{prefix}{start + i}', email=f'{prefix}{start + i}@example.com', password=encoded)
+        for i in range(users)
+    ])
+    Profile.objects.bulk_create([Profile(user=user) for user in created_users])
+
+    created = 0
+    for user in created_users:
+        count = distribution.task_count(rng)
+        for offset in range(0, count, batch_size):
+            batch = [distribution.task(rng, user, today) for _ in range(min(batch_size, count - offset))]
+            create_bulk(user.id, batch)
+            created += len(batch)
+        if progress:
+            progress(user, count)
+    return created_users, created
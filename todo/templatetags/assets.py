@@ -0,0 +1,23 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from todo.assets import BUNDLES
+
+register = template.Library()
+
+TAGS = {
+    'css': '<link rel="stylesheet" href="{}" />',
+    'js': '<script src="{}" defer></script>',
+}
+
+
+# {% bundle 'css/app.css' %}: one tag for the built bundle, or one per
+# source file while TODO_BUNDLE_ASSETS is off (development)
+@register.simple_tag
+def bundle(name):
+    tag = TAGS[name.rsplit('.', 1)[1]]
+    if settings.TODO_BUNDLE_ASSETS:
+        return format_html(tag, static(name))
+    return format_html_join('\n    ', tag, ((static(source),) for source in BUNDLES[name]))
@@ -0,0 +1,11 @@
+from django import template
+
+from todo.images import thumbnail_url
+
+register = template.Library()
+
+
+# {{ user.profile|avatar_url:'small' }}, sizes come from AVATAR_THUMBNAIL_SIZES
+@register.filter
+def avatar_url(profile, size='medium'):
+    return thumbnail_url(profile.image, size)
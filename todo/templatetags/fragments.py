@@ -0,0 +1,12 @@
+from django import template
+
+from todo.fragments import sidebar_key as _sidebar_key
+
+register = template.Library()
+
+
+# {% cache 600 sidebar request.user|sidebar_key %}: a new key whenever the
+# name, email or avatar shown in the sidebar change
+@register.filter
+def sidebar_key(user):
+    return _sidebar_key(user)
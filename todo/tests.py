@@ -1,3 +1,1313 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import datetime
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import traceback
 
-# Create your tests here.
+from PIL import Image
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from . import async_views, replicas, urls
+from .assets import BUNDLES, minify_css, minify_js
+from .bulk import apply_bulk
+from .cache import task_cache
+from .counters import adjust_task_counts
+from .events import get_backend
+from .fragments import render_rows
+from .forms import TaskForm
+from .i18n import catalog, catalog_url
+from .perf import clear_samples
+from .push import with_event_stream
+from .replicas import forget_lags
+from .search import search_tasks
+from .models import ArchivedTask, Profile, Task
+from .templatetags.assets import bundle
+from .templatetags.avatars import avatar_url
+
+
+# Page cache off, so every request exercises the database path
+NO_TASK_CACHE = {
+    **settings.CACHES,
+    'tasks': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+@override_settings(CACHES=NO_TASK_CACHE)
+class TaskListTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        for i in range(60):
+            Task.objects.create(
+                user=self.user, title=f'task {i}', complete=i % 3 == 0,
+                date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 7),
+            )
+        self.client.login(username='tester', password='secret-pass')
+
+    def test_task_list_query_count(self):
+        # session, user with profile, Last-Modified, page rows
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('alltasks'))
+        self.assertEqual(response.context['count'], 40)
+        self.assertEqual(response.context['total'], 60)
+
+    def test_search_query_count(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('alltasks'), {'search-area': 'task 1'})
+        self.assertEqual(response.context['count'], 40)
+        self.assertEqual(len(response.context['alltasks']), 11)
+
+    def test_empty_page_counts(self):
+        response = self.client.get(reverse('alltasks'), {'search-area': 'nothing'})
+        self.assertEqual(response.context['count'], 40)
+        self.assertEqual(response.context['total'], 60)
+
+    def test_cursor_pages_cover_all_tasks(self):
+        seen = []
+        params = {}
+        while True:
+            response = self.client.get(reverse('alltasks'), params)
+            seen += [task.id for task in response.context['alltasks']]
+            if not response.context['next_cursor']:
+                break
+            params = {'cursor': response.context['next_cursor']}
+        expected = list(Task.objects.filter(user=self.user).values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+
+@override_settings(CACHES=NO_TASK_CACHE)
+class SearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        self.client.login(username='tester', password='secret-pass')
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('alltasks'), {'search-area': query, **params})
+        return response, [task.title for task in response.context['alltasks']]
+
+    def test_matches_description_and_ranks_title_first(self):
+        Task.objects.create(user=self.user, title='Groceries', description='buy milk')
+        Task.objects.create(user=self.user, title='Milk the cow')
+        Task.objects.create(user=self.user, title='Laundry')
+        self.assertEqual(self.search('milk')[1], ['Milk the cow', 'Groceries'])
+
+    def test_index_follows_updates_and_deletes(self):
+        task = Task.objects.create(user=self.user, title='Write report')
+        task.title = 'Write summary'
+        task.save()
+        self.assertEqual(self.search('report')[1], [])
+        self.assertEqual(self.search('summ')[1], ['Write summary'])
+        task.delete()
+        self.assertEqual(self.search('summary')[1], [])
+
+    def test_only_own_tasks(self):
+        other = User.objects.create_user('other', password='secret-pass')
+        Task.objects.create(user=other, title='Secret plan')
+        self.assertEqual(self.search('plan')[1], [])
+
+    def test_search_results_paginate(self):
+        for i in range(55):
+            Task.objects.create(user=self.user, title=f'meeting {i}')
+        response, first = self.search('meeting')
+        _, second = self.search('meeting', cursor=response.context['next_cursor'])
+        self.assertEqual(len(first), 50)
+        self.assertEqual(len(set(first + second)), 55)
+
+
+# Hand-made cursors must not reach the database as they are
+@override_settings(CACHES=NO_TASK_CACHE)
+class MalformedCursorTest(TestCase):
+    CURSORS = [
+        [False, 'notadate', 1], [{'a': 1}, None, 1], [False, None, 'x'],
+        ['notarank', 1], [None, 1], [[1], 'x'], ['2024-01-01', 'x'],
+        'not a list', [1], ['%', None, None, None], '@@@',
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        self.client.login(username='tester', password='secret-pass')
+        for i in range(3):
+            Task.objects.create(user=self.user, title=f'meeting {i}', complete=True)
+        ArchivedTask.objects.create(id=10**6, user=self.user, title='Old meeting', updated_at=timezone.now())
+
+    def cursors(self):
+        for values in self.CURSORS:
+            if values == '@@@':
+                yield values
+            else:
+                yield base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def test_each_ordering_falls_back_to_the_first_page(self):
+        pages = [
+            (reverse('alltasks'), {}, lambda r: len(r.context['alltasks'])),
+            (reverse('alltasks'), {'search-area': 'meeting'}, lambda r: len(r.context['alltasks'])),
+            (reverse('api-tasks'), {}, lambda r: len(r.json()['results'])),
+            (reverse('archived-tasks'), {}, lambda r: len(r.context['archived'])),
+        ]
+        for url, params, count in pages:
+            expected = count(self.client.get(url, params))
+            for cursor in self.cursors():
+                with self.subTest(url=url, params=params, cursor=cursor):
+                    response = self.client.get(url, {**params, 'cursor': cursor})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(count(response), expected)
+
+
+class TaskCacheTest(TestCase):
+    def setUp(self):
+        task_cache().clear()
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        self.task = Task.objects.create(user=self.user, title='Cached task')
+        self.client.login(username='tester', password='secret-pass')
+
+    def test_second_hit_skips_task_query(self):
+        self.client.get(reverse('alltasks'))
+        # session, the user and Last-Modified are cached
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('alltasks'))
+        self.assertContains(response, 'Cached task')
+
+    def test_save_and_delete_invalidate(self):
+        self.client.get(reverse('alltasks'))
+        self.task.title = 'Renamed task'
+        self.task.save()
+        response = self.client.get(reverse('alltasks'))
+        self.assertContains(response, 'Renamed task')
+        self.task.delete()
+        response = self.client.get(reverse('alltasks'))
+        self.assertNotContains(response, 'Renamed task')
+        self.assertEqual(response.context['total'], 0)
+
+    def test_write_in_another_process_is_seen(self):
+        self.client.get(reverse('alltasks'))
+        # No signal reaches this process, only the database moves
+        Task.objects.bulk_create([Task(user=self.user, title='Added elsewhere')])
+        adjust_task_counts(self.user.id, 1, 1)
+        response = self.client.get(reverse('alltasks'))
+        self.assertContains(response, 'Added elsewhere')
+        self.assertEqual(response.context['total'], 2)
+
+    def test_pages_are_per_user(self):
+        other = User.objects.create_user('other', password='secret-pass')
+        Task.objects.create(user=other, title='Other task')
+        self.client.get(reverse('alltasks'))
+        self.client.login(username='other', password='secret-pass')
+        response = self.client.get(reverse('alltasks'))
+        self.assertContains(response, 'Other task')
+        self.assertNotContains(response, 'Cached task')
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        self.task = Task.objects.create(user=self.user, title='Some task')
+        self.client.login(username='tester', password='secret-pass')
+
+    def revalidate(self, url):
+        response = self.client.get(url)
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_are_not_modified(self):
+        for url in [reverse('alltasks'), reverse('profile-edit')]:
+            response = self.revalidate(url)
+            self.assertEqual(response.status_code, 304)
+            self.assertFalse(response.content)
+
+    def test_task_changes_modify_the_list(self):
+        etag = self.client.get(reverse('alltasks'))['ETag']
+        self.task.complete = True
+        self.task.save()
+        response = self.client.get(reverse('alltasks'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.task.delete()
+        response = self.client.get(reverse('alltasks'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_task_edits_modify_the_list(self):
+        etag = self.client.get(reverse('alltasks'))['ETag']
+        self.task.title = 'Renamed task'
+        self.task.save()
+        response = self.client.get(reverse('alltasks'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        apply_bulk(self.user, [self.task.id], 'shift', days=1)
+        response = self.client.get(reverse('alltasks'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(reverse('alltasks'))['Last-Modified']
+        response = self.client.get(reverse('alltasks'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+
+class AvatarTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        self.client.login(username='tester', password='secret-pass')
+
+    def upload(self, size=(1600, 1200), color=(200, 30, 30, 255), username='tester'):
+        buffer = io.BytesIO()
+        Image.new('RGBA', size, color).save(buffer, format='PNG')
+        upload = SimpleUploadedFile('avatar.png', buffer.getvalue(), content_type='image/png')
+        return self.client.post(reverse('profile-edit'), {
+            'username': username, 'email': f'{username}@example.com', 'image': upload,
+        })
+
+    def test_upload_is_resized_and_recompressed(self):
+        self.upload()
+        profile = Profile.objects.get(user=self.user)
+        self.assertTrue(profile.image.name.endswith('.webp'))
+        with Image.open(profile.image.path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertLessEqual(max(image.size), 512)
+
+    def test_thumbnail_sizes(self):
+        self.upload()
+        profile = Profile.objects.get(user=self.user)
+        url = avatar_url(profile, 'small')
+        self.assertIn('/thumbs/', url)
+        with Image.open(os.path.join(self.media.name, url[len('/media/'):])) as image:
+            self.assertEqual(image.size, (64, 64))
+        self.assertContains(self.client.get(reverse('alltasks')), avatar_url(profile, 'medium'))
+
+    def test_thumbnail_is_made_once(self):
+        self.upload()
+        profile = Profile.objects.get(user=self.user)
+        url = avatar_url(profile, 'small')
+        self.assertEqual(avatar_url(profile, 'small'), url)
+        self.assertEqual(len(os.listdir(os.path.join(self.media.name, 'profile_pics', 'thumbs'))), 1)
+
+    def test_identical_uploads_share_one_file(self):
+        self.upload()
+        User.objects.create_user('other', password='secret-pass')
+        self.client.login(username='other', password='secret-pass')
+        self.upload(username='other')
+        names = set(Profile.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(os.listdir(os.path.join(self.media.name, 'profile_pics')), [os.path.basename(names.pop())])
+
+    def sweep(self, *args):
+        call_command('sweep_avatars', *args, stdout=io.StringIO())
+
+    def test_replaced_avatar_is_swept_when_unused(self):
+        self.upload()
+        old = Profile.objects.get(user=self.user).image
+        thumbnail = avatar_url(Profile.objects.get(user=self.user), 'small')
+        other = User.objects.create_user('other', password='secret-pass')
+        Profile.objects.filter(user=other).update(image=old.name)
+        self.upload(color=(30, 200, 30, 255))
+        current = Profile.objects.get(user=self.user).image
+        self.sweep('--grace', '0')
+        self.assertTrue(os.path.exists(old.path))
+        other.delete()
+        # Requests never delete, only the sweep does
+        self.assertTrue(os.path.exists(old.path))
+        self.sweep('--grace', '3600')
+        self.assertTrue(os.path.exists(old.path))
+        self.sweep('--grace', '0')
+        self.assertFalse(os.path.exists(old.path))
+        self.assertFalse(os.path.exists(os.path.join(self.media.name, thumbnail[len('/media/'):])))
+        self.assertTrue(os.path.exists(current.path))
+
+    def test_reused_blob_outlives_the_grace_period(self):
+        self.upload()
+        blob = Profile.objects.get(user=self.user).image
+        Profile.objects.filter(user=self.user).update(image='default.png')
+        long_ago = time.time() - 7200
+        os.utime(blob.path, (long_ago, long_ago))
+        # An upload of the same bytes, its profile not saved yet
+        with open(blob.path, 'rb') as f:
+            self.assertEqual(blob.storage.save('profile_pics/again.webp', f), blob.name)
+        self.sweep('--grace', '3600')
+        self.assertTrue(os.path.exists(blob.path))
+
+    def test_dedupe_command(self):
+        folder = os.path.join(self.media.name, 'profile_pics')
+        os.makedirs(folder)
+        for name in ['ava.png', 'ava_AbC123.png', 'ava_XyZ789.png']:
+            with open(os.path.join(folder, name), 'wb') as f:
+                f.write(b'same picture')
+        os.makedirs(os.path.join(folder, 'thumbs'))
+        with open(os.path.join(folder, 'thumbs', 'ava_XyZ789_64.webp'), 'wb') as f:
+            f.write(b'old thumbnail')
+        Profile.objects.filter(user=self.user).update(image='profile_pics/ava_XyZ789.png')
+        call_command('dedupe_avatars', stdout=io.StringIO())
+        [blob] = [name for name in os.listdir(folder) if name != 'thumbs']
+        self.assertEqual(Profile.objects.get(user=self.user).image.name, f'profile_pics/{blob}')
+        self.assertEqual(os.listdir(os.path.join(folder, 'thumbs')), [])
+
+
+class ProfileWriteTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', email='tester@example.com', password='secret-pass')
+        Task.objects.create(user=self.user, title='one')
+
+    def profile_queries(self, queries):
+        return [q['sql'] for q in queries if 'todo_profile' in q['sql']]
+
+    def test_one_profile_per_user(self):
+        self.assertEqual(Profile.objects.filter(user=self.user).count(), 1)
+        self.user.first_name = 'Test'
+        self.user.save()
+        self.assertEqual(Profile.objects.filter(user=self.user).count(), 1)
+
+    def test_login_leaves_profile_alone(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('login'), {'username': 'tester', 'password': 'secret-pass'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.profile_queries(queries), [])
+
+    def test_profile_edit_writes_only_changes(self):
+        self.client.login(username='tester', password='secret-pass')
+        data = {'username': 'tester', 'email': 'tester@example.com'}
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('profile-edit'), data)
+        self.assertEqual([q['sql'] for q in queries if q['sql'].startswith('UPDATE')], [])
+
+        before = Profile.objects.get(user=self.user).updated_at
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('profile-edit'), {**data, 'first_name': 'Test'})
+        [update] = [sql for sql in self.profile_queries(queries) if sql.startswith('UPDATE')]
+        self.assertNotIn('count', update)
+        profile = Profile.objects.get(user=self.user)
+        self.assertGreater(profile.updated_at, before)
+        self.assertEqual((profile.open_count, profile.total_count), (1, 1))
+
+
+@override_settings(CACHES=NO_TASK_CACHE)
+class SessionFastPathTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        self.client.login(username='tester', password='secret-pass')
+
+    def tables(self, path=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path or reverse('alltasks'))
+        self.assertEqual(response.status_code, 200)
+        return {table for q in queries for table in re.findall(r'FROM "(\w+)"', q['sql'])}
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_session_and_user(self):
+        self.client.login(username='tester', password='secret-pass')
+        self.assertNotIn('django_session', self.tables())
+        self.assertFalse({'django_session', 'auth_user'} & self.tables())
+        # The profile row is read for Last-Modified and the counts only
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('alltasks'))
+        profile_queries = [q['sql'] for q in queries if 'FROM "todo_profile"' in q['sql']]
+        self.assertEqual(len(profile_queries), 1)
+        self.assertTrue(profile_queries[0].startswith(
+            'SELECT "todo_profile"."updated_at", "todo_profile"."open_count", "todo_profile"."total_count" FROM'))
+
+    def test_task_write_refreshes_cached_counts(self):
+        self.client.get(reverse('alltasks'))
+        Task.objects.create(user=self.user, title='new')
+        self.assertEqual(self.client.get(reverse('alltasks')).context['count'], 1)
+
+    def test_sessions_are_read_from_the_database(self):
+        # The default without a shared session cache, see settings
+        self.assertIn('django_session', self.tables())
+        self.assertNotIn('auth_user', self.tables())
+
+    def test_password_change_ends_session(self):
+        self.client.get(reverse('alltasks'))
+        self.user.set_password('another-pass')
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('alltasks')).status_code, 302)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        Session.objects.all().delete()
+        self.client.login(username='tester', password='secret-pass')
+        self.assertNotIn('django_session', self.tables())
+        self.assertFalse(Session.objects.exists())
+
+    def test_purge_sessions(self):
+        Session.objects.all().delete()
+        expired = timezone.now() - datetime.timedelta(days=1)
+        for i in range(5):
+            Session.objects.create(session_key=f'expired{i}', session_data='', expire_date=expired)
+        Session.objects.create(session_key='current', session_data='',
+                               expire_date=timezone.now() + datetime.timedelta(days=1))
+        out = io.StringIO()
+        call_command('purge_sessions', '--batch-size', '2', '--pause', '0', stdout=out)
+        self.assertIn('5 expired sessions deleted', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['current'])
+
+
+@override_settings(CACHES=NO_TASK_CACHE)
+class FragmentCacheTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', email='tester@example.com', password='secret-pass')
+        self.client.login(username='tester', password='secret-pass')
+
+    def test_rows_are_cached_until_the_task_changes(self):
+        task = Task.objects.create(user=self.user, title='Original')
+        self.assertIn('Original', render_rows([task]))
+        # A write that does not move updated_at is not seen
+        Task.objects.filter(id=task.id).update(title='Sneaky')
+        self.assertIn('Original', render_rows([Task.objects.get(id=task.id)]))
+        task.title = 'Renamed'
+        task.save()
+        self.assertIn('Renamed', render_rows([Task.objects.get(id=task.id)]))
+
+    def test_sidebar_is_cached_until_what_it_shows_changes(self):
+        self.assertContains(self.client.get(reverse('alltasks')), 'Username: tester')
+        for name in ['alltasks', 'archived-tasks']:
+            response = self.client.get(reverse(name))
+            self.assertContains(response, 'Username: tester')
+            self.assertNotIn('profile/profile.html', [t.name for t in response.templates])
+        self.client.post(reverse('profile-edit'), {
+            'username': 'tester', 'email': 'tester@example.com', 'first_name': 'ada',
+        })
+        self.assertContains(self.client.get(reverse('alltasks')), 'Hello Ada')
+
+    def test_sidebar_follows_writes_of_other_processes(self):
+        self.client.get(reverse('alltasks'))
+        # Another process saved the user: nothing here was told, this
+        # process's user cache entry expires after its TTL
+        User.objects.filter(id=self.user.id).update(email='changed@example.com')
+        self.assertContains(self.client.get(reverse('alltasks')), 'Email: tester@example.com')
+        caches['users'].clear()
+        self.assertContains(self.client.get(reverse('alltasks')), 'Email: changed@example.com')
+
+    def test_cached_template_loader(self):
+        [(loader, loaders)] = settings.TEMPLATES[0]['OPTIONS']['loaders']
+        self.assertEqual(loader, 'django.template.loaders.cached.Loader')
+        self.assertIn('django.template.loaders.app_directories.Loader', loaders)
+
+
+class BulkTaskTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        self.tasks = [
+            Task.objects.create(user=self.user, title=f'bulk {i}', date=datetime.date(2024, 1, 1))
+            for i in range(5)
+        ]
+        self.other = Task.objects.create(
+            user=User.objects.create_user('other', password='secret-pass'), title='not mine',
+        )
+        self.client.login(username='tester', password='secret-pass')
+
+    def bulk(self, action, tasks, **data):
+        ids = [task.id for task in tasks]
+        return self.client.post(reverse('bulk-tasks'), {'action': action, 'task_ids': ids, **data})
+
+    def test_complete_is_one_update(self):
+        # session, user, savepoint, id lookup, UPDATE, counters, release savepoint
+        with self.assertNumQueries(7):
+            self.bulk('complete', self.tasks + [self.other])
+        self.assertEqual(Task.objects.filter(user=self.user, complete=True).count(), 5)
+        self.other.refresh_from_db()
+        self.assertFalse(self.other.complete)
+
+    def test_shift_dates(self):
+        self.bulk('shift', self.tasks[:2], days=3)
+        dates = list(Task.objects.filter(user=self.user).values_list('date', flat=True))
+        self.assertEqual(dates.count(datetime.date(2024, 1, 4)), 2)
+
+    def test_delete_only_own_tasks_and_updates_search(self):
+        self.bulk('delete', self.tasks[:3] + [self.other])
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 2)
+        self.assertTrue(Task.objects.filter(id=self.other.id).exists())
+        response = self.client.get(reverse('alltasks'), {'search-area': 'bulk'})
+        self.assertEqual(response.context['total'], 2)
+        self.assertEqual(len(response.context['alltasks']), 2)
+
+
+class CounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        self.client.login(username='tester', password='secret-pass')
+
+    def assertCounts(self, open_count, total_count):
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.open_count, profile.total_count), (open_count, total_count))
+
+    def test_single_task_writes(self):
+        task = Task.objects.create(user=self.user, title='one')
+        Task.objects.create(user=self.user, title='two', complete=True)
+        self.assertCounts(1, 2)
+        task.complete = True
+        task.save()
+        task.save()
+        self.assertCounts(0, 2)
+        task = Task.objects.get(pk=task.pk)
+        task.complete = False
+        task.save()
+        self.assertCounts(1, 2)
+        task.delete()
+        self.assertCounts(0, 1)
+
+    def test_failed_write_leaves_the_counts(self):
+        task = Task.objects.create(user=self.user, title='one', date=datetime.date(2024, 3, 1))
+
+        def fail(sender, **kwargs):
+            raise DatabaseError('write failed after the counters')
+        post_save.connect(fail, sender=Task)
+        post_delete.connect(fail, sender=Task)
+        try:
+            data = {'title': 'one', 'complete': 'on', 'date': '2024-03-01'}
+            with self.assertRaises(DatabaseError):
+                self.client.post(reverse('update-task', args=[task.id]), data)
+            with self.assertRaises(DatabaseError):
+                self.client.post(reverse('delete-task', args=[task.id]))
+            with self.assertRaises(DatabaseError):
+                self.client.post(reverse('api-tasks'), json.dumps({'title': 'two', 'date': '2024-03-02'}),
+                                 content_type='application/json')
+        finally:
+            post_save.disconnect(fail, sender=Task)
+            post_delete.disconnect(fail, sender=Task)
+        self.assertFalse(Task.objects.get(pk=task.pk).complete)
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 1)
+        self.assertCounts(1, 1)
+
+    def test_header_counts_do_not_wait_for_the_user_cache(self):
+        self.client.get(reverse('alltasks'))
+        # Another process moved the counters, this one still caches the user
+        Profile.objects.filter(user=self.user).update(open_count=3, total_count=4, updated_at=timezone.now())
+        response = self.client.get(reverse('alltasks'))
+        self.assertEqual((response.context['count'], response.context['total']), (3, 4))
+
+    def test_bulk_actions(self):
+        tasks = [Task.objects.create(user=self.user, title=f'bulk {i}', complete=i < 2) for i in range(5)]
+        ids = [task.id for task in tasks]
+        self.client.post(reverse('bulk-tasks'), {'action': 'toggle', 'task_ids': ids[1:]})
+        self.assertCounts(1, 5)
+        self.client.post(reverse('bulk-tasks'), {'action': 'complete', 'task_ids': ids})
+        self.assertCounts(0, 5)
+        self.client.post(reverse('bulk-tasks'), {'action': 'uncomplete', 'task_ids': ids[:3]})
+        self.assertCounts(3, 5)
+        self.client.post(reverse('bulk-tasks'), {'action': 'delete', 'task_ids': ids[2:]})
+        self.assertCounts(2, 2)
+        response = self.client.get(reverse('alltasks'))
+        self.assertEqual((response.context['count'], response.context['total']), (2, 2))
+
+    def test_import(self):
+        data = 'title,complete,date\nWater plants,0,2024-03-01\nFile taxes,1,2024-03-02\nCall mom,0,2024-03-03\n'
+        upload = SimpleUploadedFile('tasks.csv', data.encode())
+        self.client.post(reverse('import-tasks'), {'file': upload, 'format': 'csv'})
+        self.assertCounts(2, 3)
+
+    def test_reconcile_repairs_drift(self):
+        Task.objects.create(user=self.user, title='one')
+        Task.objects.create(user=self.user, title='two', complete=True)
+        other = User.objects.create_user('other')
+        Task.objects.create(user=other, title='three')
+        Profile.objects.filter(user=self.user).update(open_count=7, total_count=0)
+
+        out = io.StringIO()
+        call_command('reconcile_task_counts', '--dry-run', stdout=out)
+        self.assertIn('tester: open 7 -> 1, total 0 -> 2', out.getvalue())
+        self.assertNotIn('other', out.getvalue())
+        self.assertCounts(7, 0)
+
+        call_command('reconcile_task_counts', '--user', 'other', stdout=out)
+        self.assertCounts(7, 0)
+        out = io.StringIO()
+        call_command('reconcile_task_counts', stdout=out)
+        self.assertIn('1 profiles repaired', out.getvalue())
+        self.assertCounts(1, 2)
+
+
+class ArchiveTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        self.client.login(username='tester', password='secret-pass')
+        self.old = Task.objects.create(user=self.user, title='Old chore', complete=True)
+        self.recent = Task.objects.create(user=self.user, title='Recent chore', complete=True)
+        self.open = Task.objects.create(user=self.user, title='Old open chore')
+        long_ago = timezone.now() - datetime.timedelta(days=60)
+        Task.objects.filter(pk__in=[self.old.pk, self.open.pk]).update(updated_at=long_ago)
+
+    def assertCounts(self, open_count, total_count):
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.open_count, profile.total_count), (open_count, total_count))
+
+    def test_command_moves_old_completed_tasks(self):
+        out = io.StringIO()
+        call_command('archive_tasks', '--days', '30', '--dry-run', stdout=out)
+        self.assertIn('1 tasks would be archived', out.getvalue())
+        self.assertTrue(Task.objects.filter(pk=self.old.pk).exists())
+
+        call_command('archive_tasks', '--days', '30', '--batch-size', '1', stdout=io.StringIO())
+        self.assertEqual(set(Task.objects.values_list('title', flat=True)), {'Recent chore', 'Old open chore'})
+        self.assertEqual(list(ArchivedTask.objects.values_list('id', 'title')), [(self.old.pk, 'Old chore')])
+        self.assertCounts(1, 2)
+        self.assertEqual(search_tasks(Task.objects.filter(user=self.user), 'chore').count(), 2)
+
+        response = self.client.get(reverse('alltasks'))
+        self.assertNotContains(response, 'Old chore')
+        response = self.client.get(reverse('archived-tasks'))
+        self.assertContains(response, 'Old chore')
+        self.assertNotContains(response, 'Recent chore')
+
+    def test_restore(self):
+        call_command('archive_tasks', '--days', '30', stdout=io.StringIO())
+        other = User.objects.create_user('other')
+        ArchivedTask.objects.create(id=10**6, user=other, title='Not mine', updated_at=timezone.now())
+
+        response = self.client.post(reverse('restore-tasks'), {'task_ids': [self.old.pk, 10**6]})
+        self.assertRedirects(response, reverse('archived-tasks'))
+        task = Task.objects.get(pk=self.old.pk)
+        self.assertEqual((task.title, task.complete), ('Old chore', True))
+        self.assertEqual(list(ArchivedTask.objects.values_list('title', flat=True)), ['Not mine'])
+        self.assertCounts(1, 3)
+        self.assertContains(self.client.get(reverse('alltasks')), 'Old chore')
+
+        # Restored tasks count as changed now, the next run leaves them
+        call_command('archive_tasks', '--days', '30', stdout=io.StringIO())
+        self.assertTrue(Task.objects.filter(pk=self.old.pk).exists())
+
+    def test_export_includes_archive(self):
+        call_command('archive_tasks', '--days', '30', stdout=io.StringIO())
+        response = self.client.get(reverse('export-tasks'), {'format': 'csv'})
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(sorted(row['title'] for row in rows), ['Old chore', 'Old open chore', 'Recent chore'])
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        Task.objects.create(user=self.user, title='Pay rent, "now"', date=datetime.date(2024, 2, 1))
+        Task.objects.create(user=self.user, title='Call mom', complete=True, date=None)
+        Task.objects.create(user=User.objects.create_user('other'), title='Not mine')
+        self.client.login(username='tester', password='secret-pass')
+
+    def export(self, export_format):
+        response = self.client.get(reverse('export-tasks'), {'format': export_format})
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('csv'))))
+        self.assertEqual([row['title'] for row in rows], ['Pay rent, "now"', 'Call mom'])
+        self.assertEqual(rows[0]['date'], '2024-02-01')
+
+    def test_ndjson(self):
+        rows = [json.loads(line) for line in self.export('ndjson').splitlines()]
+        self.assertEqual([row['complete'] for row in rows], [False, True])
+        self.assertIsNone(rows[1]['date'])
+
+
+# replica1 mirrors the test database (see todoapp.test_runner), so a query
+# on either connection sees the same rows; the captured queries tell where it went. A
+# TransactionTestCase, the mirror connection only sees committed rows.
+@override_settings(CACHES=NO_TASK_CACHE, TODO_DB_REPLICAS=['replica1'])
+class ReplicaRoutingTest(TransactionTestCase):
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        forget_lags()
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        Task.objects.create(user=self.user, title='Water plants')
+        self.client.login(username='tester', password='secret-pass')
+
+    def task_queries(self, url, **params):
+        return self.count_task_queries(lambda: self.client.get(url, params))
+
+    def count_task_queries(self, get):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = get()
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        def count(queries):
+            return sum('todo_task' in query['sql'] for query in queries)
+        return count(primary.captured_queries), count(replica.captured_queries)
+
+    def test_async_list_reads_from_the_replica(self):
+        request = AsyncRequestFactory().get('/')
+        request.user = User.objects.select_related('profile').get(pk=self.user.pk)
+        # As replica_middleware sets it, the ORM calls run in this thread
+        token = replicas.current.set(replicas.Route())
+        try:
+            primary, replica = self.count_task_queries(lambda: async_to_sync(async_views.atask_list)(request))
+        finally:
+            replicas.current.reset(token)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_read_only_pages_read_from_the_replica(self):
+        self.assertEqual(self.task_queries(reverse('alltasks'))[0], 0)
+        self.assertGreater(self.task_queries(reverse('alltasks'))[1], 0)
+        self.assertEqual(self.task_queries(reverse('export-tasks'), format='csv'), (0, 1))
+        # Pages without replica_reads stay on the primary
+        self.assertEqual(self.task_queries(reverse('import-tasks'))[1], 0)
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        response = self.client.post(reverse('create-task'), {'title': 'Pay rent', 'description': '',
+                                                             'date': '2024-03-01'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.cookies[settings.TODO_DB_STICKY_COOKIE]['max-age'],
+                         settings.TODO_DB_STICKY_SECONDS)
+        self.assertEqual(self.task_queries(reverse('alltasks'))[1], 0)
+
+        self.client.cookies.pop(settings.TODO_DB_STICKY_COOKIE)
+        self.assertEqual(self.task_queries(reverse('alltasks'))[0], 0)
+
+    def test_lagging_replica_is_skipped(self):
+        with self.settings(TODO_DB_MAX_REPLICA_LAG=-1):
+            primary, replica = self.task_queries(reverse('alltasks'))
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+
+class ImportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        self.client.login(username='tester', password='secret-pass')
+
+    def test_csv_upload(self):
+        data = (
+            'title,description,complete,date\n'
+            'Water plants,,0,2024-03-01\n'
+            ',missing title,1,2024-03-02\n'
+            'File taxes,before april,true,2024-03-03\n'
+        )
+        upload = SimpleUploadedFile('tasks.csv', data.encode())
+        response = self.client.post(reverse('import-tasks'), {'file': upload, 'format': 'csv'})
+        result = response.context['result']
+        self.assertEqual((result.created, result.skipped), (2, 1))
+        self.assertEqual(result.errors[0][0], 3)
+        self.assertEqual(
+            list(Task.objects.filter(user=self.user).values_list('title', 'complete')),
+            [('Water plants', False), ('File taxes', True)],
+        )
+        # Bulk inserted tasks are searchable
+        response = self.client.get(reverse('alltasks'), {'search-area': 'april'})
+        self.assertEqual([task.title for task in response.context['alltasks']], ['File taxes'])
+
+    def test_unreadable_files(self):
+        upload = SimpleUploadedFile('tasks.csv', 'title\nWater plants\n'.encode('utf-16'))
+        response = self.client.post(reverse('import-tasks'), {'file': upload, 'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        result = response.context['result']
+        self.assertEqual((result.created, result.skipped), (0, 1))
+        self.assertEqual(result.errors[0][0], 1)
+
+        data = b'title,date\nWater plants,2024-03-01\nCaf\xe9,2024-03-02\nFile taxes,2024-03-03\n'
+        upload = SimpleUploadedFile('tasks.csv', data)
+        result = self.client.post(reverse('import-tasks'), {'file': upload, 'format': 'csv'}).context['result']
+        self.assertEqual((result.created, result.errors[0][0]), (1, 3))
+
+        data = (b'\xef\xbb\xbf{"title": "Water plants", "date": "2024-03-01"}\n{"title": "Caf\xe9"}\n'
+                b'{"title": "File taxes", "date": "2024-03-03"}\n')
+        upload = SimpleUploadedFile('tasks.ndjson', data)
+        result = self.client.post(reverse('import-tasks'), {'file': upload, 'format': 'ndjson'}).context['result']
+        self.assertEqual((result.created, result.skipped, result.errors[0][0]), (2, 1, 2))
+
+    def test_values_that_are_not_strings(self):
+        rows = [{'title': 'Water plants', 'date': 5}, {'title': 'File taxes', 'date': ['2024-03-01']},
+                {'title': {'text': 'x'}, 'date': '2024-03-01'},
+                {'title': 'Call mom', 'complete': 1, 'date': '2024-03-03', 'description': None}]
+        data = ''.join(json.dumps(row) + '\n' for row in rows).encode()
+        upload = SimpleUploadedFile('tasks.ndjson', data)
+        response = self.client.post(reverse('import-tasks'), {'file': upload, 'format': 'ndjson'})
+        self.assertEqual(response.status_code, 200)
+        result = response.context['result']
+        self.assertEqual((result.created, result.skipped), (1, 3))
+        self.assertEqual([(line, list(errors)) for line, errors in result.errors],
+                         [(1, ['date']), (2, ['date']), (3, ['title'])])
+        self.assertTrue(Task.objects.get(title='Call mom').complete)
+
+    def test_command_batches(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as f:
+            for i in range(25):
+                f.write(json.dumps({'title': f'imported {i}', 'complete': i % 2 == 0, 'date': '2024-05-01'}) + '\n')
+            f.write('{broken\n')
+        self.addCleanup(os.remove, f.name)
+        out = io.StringIO()
+        call_command('import_tasks', 'tester', f.name, '--batch-size', '10', stdout=out, stderr=io.StringIO())
+        self.assertEqual(out.getvalue().count('batch '), 3)
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 25)
+
+
+class TaskApiTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        for i in range(7):
+            Task.objects.create(user=self.user, title=f'api {i}', date=datetime.date(2024, 1, 1 + i))
+        self.client.login(username='tester', password='secret-pass')
+
+    def send(self, method, url, body):
+        return getattr(self.client, method)(url, json.dumps(body), content_type='application/json')
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api-tasks')).status_code, 401)
+
+    def test_list_fields_and_cursor(self):
+        titles = []
+        params = {'fields': 'title', 'limit': 3}
+        while True:
+            # session, user (cached after the first page), page rows
+            with self.assertNumQueries(3 if not titles else 2):
+                data = self.client.get(reverse('api-tasks'), params).json()
+            self.assertTrue(all(list(row) == ['title'] for row in data['results']))
+            titles += [row['title'] for row in data['results']]
+            if not data['next']:
+                break
+            params['cursor'] = data['next']
+        self.assertEqual(titles, [f'api {i}' for i in range(7)])
+
+    def test_unknown_field(self):
+        self.assertEqual(self.client.get(reverse('api-tasks'), {'fields': 'user__password'}).status_code, 400)
+
+    def test_create_update_toggle_delete(self):
+        response = self.send('post', reverse('api-tasks'), {'title': 'from api', 'date': '2024-06-01'})
+        self.assertEqual(response.status_code, 201)
+        task_id = response.json()['id']
+        url = reverse('api-task', args=[task_id])
+
+        response = self.send('patch', url, {'description': 'patched'})
+        self.assertEqual(response.json()['title'], 'from api')
+        self.assertEqual(response.json()['description'], 'patched')
+
+        response = self.client.post(reverse('api-toggle-task', args=[task_id]))
+        self.assertTrue(response.json()['complete'])
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_invalid_task(self):
+        response = self.send('post', reverse('api-tasks'), {'title': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('title', response.json()['errors'])
+
+    def test_values_that_are_not_strings(self):
+        response = self.send('post', reverse('api-tasks'), {'title': 'x', 'date': 5})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['errors']), ['date'])
+        task = Task.objects.filter(user=self.user).first()
+        response = self.send('patch', reverse('api-task', args=[task.id]), {'date': [1], 'complete': {}})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['errors']), ['complete', 'date'])
+        response = self.send('patch', reverse('api-task', args=[task.id]), {'complete': True, 'description': None})
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_users_tasks_are_hidden(self):
+        other = Task.objects.create(user=User.objects.create_user('other'), title='other')
+        self.assertEqual(self.client.get(reverse('api-task', args=[other.id])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('api-toggle-task', args=[other.id])).status_code, 404)
+        self.assertEqual(self.client.delete(reverse('api-task', args=[other.id])).status_code, 404)
+
+
+@override_settings(CACHES=NO_TASK_CACHE)
+class AsyncViewTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        self.task = Task.objects.create(user=self.user, title='Async task', date=datetime.date(2024, 1, 1))
+        # As the auth backend loads it, with the profile's current counts
+        self.user = User.objects.select_related('profile').get(pk=self.user.pk)
+        self.factory = AsyncRequestFactory()
+
+    def request(self, method, path, data=None, user=None):
+        request = getattr(self.factory, method)(path, data or {})
+        request.user = user or self.user
+        request._dont_enforce_csrf_checks = True
+        return request
+
+    async def test_list(self):
+        response = await async_views.atask_list(self.request('get', '/'))
+        self.assertContains(response, 'Async task')
+        self.assertContains(response, 'You have 1 incomplete task')
+
+    async def test_list_not_modified(self):
+        first = self.request('get', '/')
+        response = await async_views.atask_list(first)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        def revalidate():
+            # The browser sends back the CSRF cookie it got with the page
+            request = self.request('get', '/')
+            request.META.update(CSRF_COOKIE=first.META['CSRF_COOKIE'], HTTP_IF_NONE_MATCH=response['ETag'])
+            return async_views.atask_list(request)
+
+        not_modified = await revalidate()
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertFalse(not_modified.content)
+        await Task.objects.acreate(user=self.user, title='Another task', date=datetime.date(2024, 1, 2))
+        self.assertEqual((await revalidate()).status_code, 200)
+
+    async def test_list_requires_login(self):
+        response = await async_views.atask_list(self.request('get', '/', user=AnonymousUser()))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_create_update_delete(self):
+        data = {'title': 'Made async', 'date': '2024-02-02'}
+        response = await async_views.ataskcreate(self.request('post', '/create_task', data))
+        self.assertEqual(response.status_code, 302)
+        task = await Task.objects.aget(title='Made async')
+
+        data = {'title': 'Renamed async', 'date': '2024-02-03', 'complete': 'on'}
+        await async_views.ataskupdate(self.request('post', '/update_task', data), task.id)
+        task = await Task.objects.aget(id=task.id)
+        self.assertTrue(task.complete)
+
+        await async_views.ataskdelete(self.request('post', '/delete_task'), task.id)
+        self.assertEqual(await Task.objects.filter(user=self.user).acount(), 1)
+
+    async def test_other_users_task_is_not_found(self):
+        other = await sync_to_async(User.objects.create_user)('other')
+        with self.assertRaises(Http404):
+            await async_views.ataskupdate(self.request('get', '/update_task', user=other), self.task.id)
+
+
+class PushEventsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        self.client.login(username='tester', password='secret-pass')
+        self.cookie = f'sessionid={self.client.cookies["sessionid"].value}'.encode()
+
+    def save_task(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Task.objects.create(user=self.user, date=datetime.date(2024, 1, 1), **fields)
+
+    def delete_task(self, task):
+        with self.captureOnCommitCallbacks(execute=True):
+            task.delete()
+
+    def open_stream(self, cookie=None):
+        inbox, sent = asyncio.Queue(), []
+
+        async def send(message):
+            sent.append(message)
+        scope = {'type': 'http', 'path': '/events', 'headers': [(b'cookie', cookie or self.cookie)]}
+        stream = asyncio.ensure_future(with_event_stream(None)(scope, inbox.get, send))
+        return stream, inbox, sent
+
+    async def body_until(self, sent, text):
+        for _ in range(200):
+            body = b''.join(m.get('body', b'') for m in sent).decode()
+            if text in body:
+                return body
+            await asyncio.sleep(0.01)
+        self.fail(f'{text!r} not in {body!r}')
+
+    async def test_stream_sends_task_changes(self):
+        stream, inbox, sent = self.open_stream()
+        await self.body_until(sent, ': connected')
+        self.assertEqual(sent[0]['status'], 200)
+
+        task = await sync_to_async(self.save_task)(title='Pushed task')
+        body = await self.body_until(sent, 'event: created')
+        self.assertIn(f'data-task-id=\\"{task.id}\\"', body)
+        self.assertIn('"counts":{"open":1,"total":1}', body)
+        task_id = task.id
+        await sync_to_async(self.delete_task)(task)
+        body = await self.body_until(sent, 'event: deleted')
+        self.assertIn(f'"id":{task_id}', body)
+
+        await inbox.put({'type': 'http.disconnect'})
+        await stream
+        self.assertFalse(get_backend().listening(self.user.id))
+
+    async def test_stream_requires_login(self):
+        stream, inbox, sent = self.open_stream(cookie=b'sessionid=nope')
+        await stream
+        self.assertEqual(sent[0]['status'], 401)
+
+    def test_no_events_without_streams(self):
+        with self.assertNumQueries(0):
+            get_backend().publish(self.user.id, [b'event: reload\ndata: {}\n\n'])
+        self.assertFalse(get_backend().listening(self.user.id))
+
+    @override_settings(TODO_PUSH_EVENTS=True, CACHES=NO_TASK_CACHE)
+    def test_task_list_connects_when_served(self):
+        response = self.client.get(reverse('alltasks'))
+        self.assertContains(response, 'data-events="/events"')
+        self.assertContains(response, 'js/task_events')
+
+
+class AssetTest(TestCase):
+    def test_minify_css_keeps_strings_and_selectors(self):
+        css = minify_css('a :hover , b > c {\n  content : "a, b ;}" ;\n  color: red;\n}\n/* note */\n')
+        self.assertEqual(css, 'a :hover,b>c{content :"a, b ;}";color:red}\n')
+
+    def test_minify_js_keeps_line_breaks_strings_and_regexes(self):
+        js = minify_js('var a = 1 // one\nvar b = a\n++b\nvar re = /a\\/b[/]/g, s = "x  y"\nreturn a - -b\n')
+        self.assertEqual(js, 'var a=1\nvar b=a\n++b\nvar re=/a\\/b[/]/g,s="x  y"\nreturn a- -b\n')
+
+    def test_bundle_tag(self):
+        with override_settings(TODO_BUNDLE_ASSETS=True):
+            self.assertRegex(bundle('js/app.js'), r'^<script src="/static/js/app(\.\w+)?\.js" defer></script>$')
+        with override_settings(TODO_BUNDLE_ASSETS=False):
+            self.assertEqual(bundle('css/app.css').count('<link'), len(BUNDLES['css/app.css']))
+
+    def test_build_and_serve(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        assets_root, static_root = os.path.join(root.name, 'build'), os.path.join(root.name, 'static')
+        with override_settings(ASSETS_ROOT=assets_root, STATIC_ROOT=static_root,
+                               STATICFILES_DIRS=[os.path.join(os.path.dirname(__file__), '..', 'static'), assets_root]):
+            os.makedirs(assets_root)
+            call_command('build_assets', stdout=io.StringIO(), stderr=io.StringIO())
+            with open(os.path.join(static_root, 'staticfiles.json')) as f:
+                hashed = json.load(f)['paths']['css/app.css']
+            self.assertTrue(os.path.exists(os.path.join(static_root, hashed + '.gz')))
+
+            response = self.client.get('/static/' + hashed, HTTP_ACCEPT_ENCODING='gzip, deflate')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            response = self.client.get('/static/css/app.css')
+            self.assertNotIn('Content-Encoding', response)
+            self.assertIn('must-revalidate', response['Cache-Control'])
+            self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+
+class DateWidgetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='secret-pass')
+
+    def test_date_input(self):
+        html = str(TaskForm(initial={'date': datetime.date(2024, 3, 9)})['date'])
+        self.assertIn('type="date"', html)
+        self.assertIn('value="2024-03-09"', html)
+
+    def test_scripts_only_on_form_pages(self):
+        response = self.client.get(reverse('login'))
+        self.assertNotContains(response, 'jsi18n')
+        self.assertNotContains(response, 'jquery')
+        self.client.login(username='tester', password='secret-pass')
+        response = self.client.get(reverse('create-task'))
+        self.assertContains(response, f'<script src="{catalog_url()}" defer></script>', html=False)
+        self.assertContains(response, 'js/date_widget')
+
+    def test_catalog_is_versioned_and_rendered_once(self):
+        url = catalog_url()
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn(b'gettext', response.content)
+        hits = catalog.cache_info().hits
+        self.client.get(url)
+        self.assertEqual(catalog.cache_info().hits, hits + 1)
+
+        stale = self.client.get(reverse('js-catlog', args=['en', 'old']))
+        self.assertEqual(stale['Cache-Control'], 'no-cache')
+        self.assertEqual(stale.content, response.content)
+        self.assertEqual(self.client.get(reverse('js-catlog', args=['xx', 'old'])).status_code, 404)
+
+
+@override_settings(CACHES=NO_TASK_CACHE)
+class PerformanceMiddlewareTest(TestCase):
+    def setUp(self):
+        clear_samples()
+        self.addCleanup(clear_samples)
+        self.user = User.objects.create_user('tester', password='secret-pass')
+        Task.objects.create(user=self.user, title='Timed task')
+        self.client.login(username='tester', password='secret-pass')
+
+    def test_server_timing(self):
+        timing = self.client.get(reverse('alltasks'))['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="4 queries", tpl;dur=[\d.]+$')
+        self.assertNotRegex(timing, r'tpl;dur=0\.0$')
+
+    def test_percentiles_per_url_name(self):
+        for _ in range(3):
+            self.client.get(reverse('alltasks'))
+        self.client.get(reverse('create-task'))
+        self.user.is_staff = True
+        self.user.save()
+        report = self.client.get(reverse('perf-stats')).json()['urls']
+        self.assertEqual(set(report), {'alltasks', 'create-task'})
+        self.assertEqual(report['alltasks']['count'], 3)
+        # The first request loads the user, the others find it cached
+        self.assertEqual(report['alltasks']['queries']['p50'], 3)
+        self.assertGreater(report['alltasks']['size']['p99'], 0)
+
+    def test_perf_stats_is_for_staff_only(self):
+        # A reverse proxy on the same host makes every request local
+        response = self.client.get(reverse('perf-stats'), REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 404)
+        with self.settings(PERF_STATS_OPEN=True):
+            self.assertEqual(self.client.get(reverse('perf-stats')).status_code, 200)
+
+    async def test_async_request(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(reverse('alltasks'))
+        self.assertIn('desc="4 queries"', response['Server-Timing'])
+
+
+# Query scaling harness: every named URL of todo/urls.py is requested for
+# users with 10, 1,000 and 10,000 tasks. A query that runs more often for
+# the bigger users (a per-row query in a template loop) or one slower than
+# QUERY_BUDGET_MS fails the test, with its SQL and where it came from.
+QUERY_SCALES = [10, 1000, 10000]
+QUERY_BUDGET_MS = float(os.environ.get('TODO_QUERY_BUDGET_MS', 100))
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(\.\d+)?\b")
+SQL_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+
+
+def normalize_sql(sql):
+    return SQL_LISTS.sub('(...)', SQL_LITERALS.sub('?', sql))
+
+
+def app_stack():
+    # The frames of this project, innermost last
+    return [frame for frame in traceback.extract_stack()[:-2]
+            if frame.filename.startswith(str(settings.BASE_DIR)) and 'site-packages' not in frame.filename
+            and frame.name != 'record_query' and not frame.filename.endswith('manage.py')]
+
+
+def template_line():
+    # Template, line and tag being rendered when the query ran, if any
+    frame = sys._getframe(2)
+    while frame:
+        node = frame.f_locals.get('self') if frame.f_code.co_name == 'render_annotated' else None
+        if node is not None and getattr(node, 'origin', None):
+            return f'  {node.origin.template_name}, line {node.token.lineno}: {node.token.contents}\n'
+        frame = frame.f_back
+    return ''
+
+
+class QueryLog:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - start) * 1000, app_stack(), template_line()))
+
+    def counts(self):
+        counts = {}
+        for sql, *_ in self.queries:
+            counts[normalize_sql(sql)] = counts.get(normalize_sql(sql), 0) + 1
+        return counts
+
+    def last(self, normalized):
+        # The last run of a repeated query is one of the extra ones
+        return [query for query in self.queries if normalize_sql(query[0]) == normalized][-1]
+
+
+def describe_query(sql, elapsed, stack, template):
+    return f'{elapsed:.1f} ms: {sql}\n' + ''.join(traceback.format_list(stack)) + template
+
+
+def named_urls():
+    return [pattern.name for pattern in urls.urlpatterns if isinstance(pattern, URLPattern) and pattern.name]
+
+
+@override_settings(CACHES=NO_TASK_CACHE)
+class QueryScalingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {}
+        for size in QUERY_SCALES:
+            user = User.objects.create_user(f'scale{size}')
+            Task.objects.bulk_create(
+                Task(user=user, title=f'task {i}', description='scaled', complete=i % 4 == 0,
+                     date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 90))
+                for i in range(size)
+            )
+            cls.users[size] = user
+
+    def url_for(self, name, user):
+        pattern = next(p for p in urls.urlpatterns if getattr(p, 'name', None) == name)
+        values = {'task_id': Task.objects.filter(user=user).values_list('id', flat=True).first(),
+                  'language': 'en', 'version': catalog('en')[1]}
+        return reverse(name, kwargs={key: values[key] for key in pattern.pattern.regex.groupindex})
+
+    def run_url(self, name, user, revalidate=False):
+        url = self.url_for(name, user)
+        self.client.force_login(user)
+        headers = {}
+        if revalidate:
+            etag = self.client.get(url).get('ETag')
+            if etag is None:
+                return None
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        log = QueryLog()
+        with connection.execute_wrapper(log):
+            response = self.client.get(url, **headers)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        if revalidate:
+            self.assertEqual(response.status_code, 304)
+        return log
+
+    def test_queries_do_not_grow_with_tasks(self):
+        for name in named_urls():
+            with self.subTest(url=name):
+                logs = {size: self.run_url(name, user) for size, user in self.users.items()}
+                smallest = logs[QUERY_SCALES[0]].counts()
+                problems = []
+                for size, log in logs.items():
+                    for normalized, count in log.counts().items():
+                        if count > smallest.get(normalized, 0):
+                            problems.append(f'runs {count} times with {size} tasks, '
+                                            f'{smallest.get(normalized, 0)} with {QUERY_SCALES[0]}\n'
+                                            + describe_query(*log.last(normalized)))
+                    problems += [f'over the {QUERY_BUDGET_MS:g} ms budget with {size} tasks\n'
+                                 + describe_query(*query) for query in log.queries if query[1] > QUERY_BUDGET_MS]
+                if problems:
+                    self.fail(f'{name}:\n' + '\n'.join(problems))
+
+    def test_not_modified_skips_the_tasks(self):
+        # The conditional check costs a primary key lookup whatever the
+        # number of tasks, it must not read them
+        for name in named_urls():
+            logs = {size: self.run_url(name, user, revalidate=True) for size, user in self.users.items()}
+            if logs[QUERY_SCALES[0]] is None:
+                continue
+            with self.subTest(url=name):
+                for size, log in logs.items():
+                    self.assertEqual(log.counts(), logs[QUERY_SCALES[0]].counts())
+                    for query in log.queries:
+                        self.assertNotIn('todo_task', query[0], describe_query(*query))
+
+
+class GenerateDataTest(TestCase):
+    def test_generate_data(self):
+        call_command('generate_data', users=3, tasks='4-6', complete_ratio=0, description_length='10',
+                     seed=7, stdout=io.StringIO())
+        users = User.objects.filter(username__startswith='loaduser').order_by('id')
+        self.assertEqual([user.username for user in users], ['loaduser0', 'loaduser1', 'loaduser2'])
+        self.assertEqual(Profile.objects.filter(user__in=users).count(), 3)
+        self.assertTrue(self.client.login(username='loaduser1', password='loadtest-pass'))
+        for user in users:
+            tasks = Task.objects.filter(user=user)
+            self.assertTrue(4 <= tasks.count() <= 6)
+            self.assertFalse(tasks.filter(complete=True).exists())
+            self.assertEqual({len(task.description) for task in tasks}, {10})
+            word = tasks[0].title.split()[0].lower()
+            self.assertIn(tasks[0], search_tasks(tasks, word))
+
+        call_command('generate_data', users=1, tasks='1', stdout=io.StringIO())
+        self.assertTrue(User.objects.filter(username='loaduser3').exists())
+
+        # Gaps and other names with the same start do not collide
+        User.objects.filter(username='loaduser1').delete()
+        User.objects.create_user('loaduser_admin')
+        call_command('generate_data', users=1, tasks='1', stdout=io.StringIO())
+        self.assertTrue(User.objects.filter(username='loaduser4').exists())
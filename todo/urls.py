@@ -1,4 +1,4 @@
-from . import views
+from . import views, api, async_views
 from .views import TaskList, Login
 
 from django.urls import path
@@ -7,20 +7,36 @@ from django.contrib.auth.views import LogoutView
 from django.conf import settings
 from django.conf.urls.static import static
 
-from django.views.i18n import JavaScriptCatalog
+# Under ASGI the task views are served by their async versions
+if settings.TODO_ASYNC_VIEWS:
+    task_list, task_create = async_views.atask_list, async_views.ataskcreate
+    task_update, task_delete = async_views.ataskupdate, async_views.ataskdelete
+else:
+    task_list, task_create = TaskList.as_view(), views.taskcreate
+    task_update, task_delete = views.taskupdate, views.taskdelete
 
 urlpatterns = [
     path('login', Login.as_view(), name='login'),
     path('logout', LogoutView.as_view(next_page = 'login'), name='logout'),
     path('register', views.regist, name='register'),
     
-    path('', TaskList.as_view(), name='alltasks'),
-    path('create_task', views.taskcreate, name='create-task'),
-    path('update_task/<task_id>', views.taskupdate, name='update-task'),
-    path('delete_task/<task_id>', views.taskdelete, name='delete-task'),
+    path('', task_list, name='alltasks'),
+    path('create_task', task_create, name='create-task'),
+    path('update_task/<task_id>', task_update, name='update-task'),
+    path('delete_task/<task_id>', task_delete, name='delete-task'),
+    path('bulk_tasks', views.taskbulk, name='bulk-tasks'),
+    path('export_tasks', views.taskexport, name='export-tasks'),
+    path('import_tasks', views.taskimport, name='import-tasks'),
+    path('archived_tasks', views.archivedtasks, name='archived-tasks'),
+    path('restore_tasks', views.taskrestore, name='restore-tasks'),
     path('profile-edit', views.userUpdate, name='profile-edit'),
     
-    path('jsi18n', JavaScriptCatalog.as_view(), name='js-catlog'),
+    path('api/tasks', api.tasks, name='api-tasks'),
+    path('api/tasks/<int:task_id>', api.task, name='api-task'),
+    path('api/tasks/<int:task_id>/toggle', api.toggle_task, name='api-toggle-task'),
+    
+    path('jsi18n/<str:language>/<str:version>.js', views.javascript_catalog, name='js-catlog'),
+    path('_perf', views.perf_stats, name='perf-stats'),
 ]
 
 if settings.DEBUG:
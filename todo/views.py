@@ -1,13 +1,28 @@
 from typing import Any
 from django.forms.models import BaseModelForm
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse, Http404
 from django.urls import reverse_lazy
 from django.shortcuts import render, redirect, get_object_or_404
 
-from .models import Task
-from .forms import RegisterForm, UserUpdateForm, ProfileUpdateForm, TaskForm
+from django.conf import settings
+from django.db import transaction
+from .models import ArchivedTask, Task
+from .archive import ARCHIVE_ORDERING, restore_tasks
+from .cache import task_cache, page_key
+from .fragments import render_rows
+from .conditional import user_condition, user_last_modified, user_profile_row
+from .replicas import replica_reads
+from .pagination import paginate, DEFAULT_ORDERING
+from .search import search_tasks
+from .bulk import apply_bulk
+from .export import FORMATS as EXPORT_FORMATS
+from .importer import import_tasks, read_rows
+from .i18n import catalog, supported_language
+from .perf import summary as perf_summary
+from .forms import RegisterForm, UserUpdateForm, ProfileUpdateForm, TaskForm, BulkTaskForm, ImportTaskForm, RestoreTaskForm
 from django.views.generic.list import ListView
 from django.views.generic.edit import DeleteView
+from django.utils.decorators import method_decorator
 
 from django.contrib.auth.views import LoginView
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -43,14 +58,23 @@ def regist(request):
  
 # Update user information       
 @login_required
+@replica_reads
+@user_condition
 def userUpdate(request):
     if request.method == 'POST':
         u_form = UserUpdateForm(request.POST, instance=request.user)
         p_form = ProfileUpdateForm(request.POST, request.FILES, instance=request.user.profile)
 
         if u_form.is_valid() and p_form.is_valid():
-            u_form.save()
-            p_form.save()
+            # Write only what changed. The profile's updated_at is the
+            # pages' Last-Modified, so it moves with a change to either
+            # form; the task counters stay out of the UPDATE.
+            if u_form.has_changed():
+                u_form.save()
+            if u_form.has_changed() or p_form.has_changed():
+                profile = p_form.save(commit=False)
+                profile.save(update_fields=[*p_form.changed_data, 'updated_at'])
+            # The previous avatar stays for manage.py sweep_avatars
             return redirect('alltasks')
     else:
         u_form = UserUpdateForm(instance=request.user)
@@ -62,23 +86,104 @@ def userUpdate(request):
     }
     return render(request, 'profile/profile_edit.html', context)
 
+# The query behind one page of the task list and the ordering to seek on
+def task_page_query(tasks, search_input):
+    ordering = DEFAULT_ORDERING
+    
+    # Full-text search on title and description, most relevant first
+    if search_input:
+        tasks = search_tasks(tasks, search_input)
+        ordering = ('-rank', 'id')
+    return tasks, ordering
+
+# Cacheable page of the task list: rendered rows and next cursor
+def task_page(rows, next_cursor):
+    return {
+        'alltasks': rows,
+        'task_rows': render_rows(rows),
+        'next_cursor': next_cursor,
+    }
+
+# Header counts, kept on the profile (todo.counters), from the row the
+# page's validators were read with (conditional.user_profile_row)
+def task_counts(profile_row):
+    if profile_row is None:
+        return {'count': 0, 'total': 0}
+    return {'count': profile_row['open_count'], 'total': profile_row['total_count']}
+
+# The push channel's URL when it is served (todoapp/asgi.py)
+def events_url():
+    return settings.TODO_EVENTS_PATH if settings.TODO_PUSH_EVENTS else None
+
 # Show all tasks
 class TaskList(LoginRequiredMixin, ListView):
     model = Task
     context_object_name = 'alltasks'
+    page_size = 50
+    
+    @method_decorator(replica_reads)
+    @method_decorator(user_condition)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+    
+    def get_queryset(self):
+        return Task.objects.filter(user=self.request.user)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['alltasks'] = context['alltasks'].filter(user=self.request.user)
-        context['count'] = context['alltasks'].filter(complete=False).count()
-        
         search_input = self.request.GET.get('search-area') or ''
-        
-        if search_input:
-            context['alltasks'] = context['alltasks'].filter(title__icontains=search_input)
+        cursor = self.request.GET.get('cursor') or ''
         context['search_input'] = search_input
+        context['is_first_page'] = not cursor
+        
+        # Rendered rows come from the per-user cache when the user's tasks
+        # have not changed since the page was last built (todo.cache)
+        cache = task_cache()
+        key = page_key(self.request.user.id, user_last_modified(self.request), search_input, cursor)
+        page = cache.get(key)
+        if page is None:
+            page = self.build_page(context['alltasks'], search_input, cursor)
+            context['alltasks'] = page.pop('alltasks')
+            cache.set(key, page)
+        context.update(page)
+        context.update(task_counts(user_profile_row(self.request)))
+        context['events_url'] = events_url()
         
         return context
+    
+    def build_page(self, tasks, search_input, cursor):
+        tasks, ordering = task_page_query(tasks, search_input)
+        
+        # Keyset pagination, seek past the last row of the previous page
+        rows, next_cursor = paginate(tasks, cursor, self.page_size, ordering)
+        return task_page(rows, next_cursor)
+
+# Single-task writes, shared with async_views and api. Row signals run
+# outside any transaction of their own, so each write is wrapped in one
+# that the counter UPDATE (signals.count_task) joins. An existing task is
+# read with SELECT ... FOR UPDATE, so "complete" as loaded, which the
+# counters' delta is taken from, is the row the write replaces and not one
+# a concurrent toggle is about to change.
+def create_task_from(form, user):
+    with transaction.atomic():
+        task = form.save(commit=False)
+        task.user = user
+        task.save()
+    return task
+
+def update_task_from(tasks, task_id, data):
+    # Returns (task, form, saved)
+    with transaction.atomic():
+        task = tasks.select_for_update().get(pk=task_id)
+        form = TaskForm(data, instance=task)
+        saved = form.is_valid()
+        if saved:
+            form.save()
+    return task, form, saved
+
+def delete_task_from(tasks, task_id):
+    with transaction.atomic():
+        tasks.select_for_update().get(pk=task_id).delete()
 
 # Create new task
 def taskcreate(request):
@@ -86,9 +191,7 @@ def taskcreate(request):
         form = TaskForm(request.POST)
         
         if form.is_valid():
-            task = form.save(commit=False)
-            task.user = request.user
-            task.save()
+            create_task_from(form, request.user)
             return HttpResponseRedirect('/')
     else:
         form = TaskForm
@@ -97,24 +200,81 @@ def taskcreate(request):
 
 # Update created task
 def taskupdate(request, task_id):
-    task = Task.objects.get(pk=task_id)
-    form = TaskForm(request.POST or None, instance=task)
-
-    if form.is_valid():
-        form.save()
-        return redirect('alltasks')
+    if request.method == "POST":
+        task, form, saved = update_task_from(Task.objects.all(), task_id, request.POST)
+        if saved:
+            return redirect('alltasks')
+    else:
+        task = Task.objects.get(pk=task_id)
+        form = TaskForm(instance=task)
     
     return render(request, 'todo/task_update.html', {'task': task, 'form': form})
 
 # Delete task
 def taskdelete(request, task_id):
-    task = Task.objects.get(pk=task_id)    
     if request.method == "POST":
-        task.delete()
+        delete_task_from(Task.objects.all(), task_id)
         return redirect('alltasks')
+    task = Task.objects.get(pk=task_id)
     
     return render(request, 'todo/confirm_delete.html', {'task': task,})
 
+# Complete, uncomplete, delete or reschedule the checked tasks at once
+@login_required
+def taskbulk(request):
+    if request.method == "POST":
+        form = BulkTaskForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            apply_bulk(request.user, data['task_ids'], data['action'], data['days'] or 0)
+    return redirect('alltasks')
+
+# Archived tasks (todo.archive), read from the archive table only
+@login_required
+@replica_reads
+@user_condition
+def archivedtasks(request):
+    cursor = request.GET.get('cursor') or ''
+    rows, next_cursor = paginate(ArchivedTask.objects.filter(user=request.user), cursor,
+                                 TaskList.page_size, ARCHIVE_ORDERING)
+    context = {'archived': rows, 'next_cursor': next_cursor, 'is_first_page': not cursor}
+    return render(request, 'todo/archived_list.html', context)
+
+# Move the checked tasks back into the task list
+@login_required
+def taskrestore(request):
+    if request.method == "POST":
+        form = RestoreTaskForm(request.POST)
+        if form.is_valid():
+            restore_tasks(request.user, form.cleaned_data['task_ids'])
+    return redirect('archived-tasks')
+
+# Download all tasks as CSV or NDJSON, streamed row by row
+@login_required
+@replica_reads
+def taskexport(request):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        raise Http404('Unknown export format')
+    stream, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(stream(request.user), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="tasks.{export_format}"'
+    return response
+
+# Create many tasks from an uploaded CSV or NDJSON file
+@login_required
+def taskimport(request):
+    result = None
+    if request.method == "POST":
+        form = ImportTaskForm(request.POST, request.FILES)
+        if form.is_valid():
+            rows = read_rows(form.cleaned_data['file'], form.cleaned_data['format'])
+            result = import_tasks(request.user, rows)
+    else:
+        form = ImportTaskForm()
+    
+    return render(request, 'todo/task_import.html', {'form': form, 'result': result})
+
 # class TaskDelete(LoginRequiredMixin, DeleteView):
 #     model = Task
 #     success_url = reverse_lazy('alltasks')
@@ -169,3 +329,27 @@ def taskdelete(request, task_id):
 #        return super(TaskCreate, self).form_valid(form)
 
         
+
+# JavaScript catalog for a language, cached for a year under its versioned
+# URL (todo.i18n.catalog_url). A stale version gets the current catalog
+# without the long cache lifetime.
+def javascript_catalog(request, language, version):
+    try:
+        language = supported_language(language)
+    except LookupError:
+        raise Http404('No such language')
+    content, digest = catalog(language)
+    response = HttpResponse(content, content_type='text/javascript; charset="utf-8"')
+    if version == digest:
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'no-cache'
+    return response
+
+# Request timing percentiles per URL name (todo.perf), for staff users, or
+# anyone with settings.PERF_STATS_OPEN. Behind a reverse proxy every
+# request comes from a local address, so that says nothing about the client.
+def perf_stats(request):
+    if not (settings.PERF_STATS_OPEN or request.user.is_staff):
+        raise Http404
+    return JsonResponse({'window_seconds': settings.PERF_WINDOW_SECONDS, 'urls': perf_summary()})
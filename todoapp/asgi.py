@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todoapp.settings')
+# Route the task views to their async versions (todo.async_views)
+os.environ.setdefault('TODO_ASYNC_VIEWS', '1')
+# Serve the task change stream (todo.push)
+os.environ.setdefault('TODO_PUSH_EVENTS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from todo.push import with_event_stream  # noqa: E402, needs the apps loaded
+
+application = with_event_stream(django_application)
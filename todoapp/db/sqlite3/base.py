@@ -0,0 +1,28 @@
+from django.db.backends.sqlite3 import base
+
+
+# Django's SQLite backend plus two OPTIONS of its own:
+#   'pragmas': {name: value} run on every new connection (journal_mode,
+#              synchronous, mmap_size, cache_size, ...)
+#   'transaction_mode': 'IMMEDIATE' takes the write lock when a transaction
+#              starts. With the default DEFERRED a read-then-write
+#              transaction fails with "database is locked" at once instead
+#              of waiting for the busy timeout.
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop('pragmas', {})
+        self.transaction_mode = kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -13,6 +13,10 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
+from todoapp.db import database_config, replica_configs
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +46,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole request (todo.perf)
+    'todo.perf.performance_middleware',
+    # Before anything that reads or writes the database (todo.replicas)
+    'todo.replicas.replica_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,12 +61,22 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'todoapp.urls'
 
+# Compiled templates are kept in memory by the cached loader, unless
+# TODO_CACHED_TEMPLATES=0 (template edits then show up without a restart)
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if os.environ.get('TODO_CACHED_TEMPLATES', '1') == '1':
+    TEMPLATE_LOADERS = [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to todo.perf
+        'BACKEND': 'todo.perf.TimedDjangoTemplates',
         'DIRS': [BASE_DIR, 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -71,18 +89,127 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'todoapp.wsgi.application'
 
+# Serve the task views with their async versions (todo.async_views),
+# todoapp/asgi.py turns this on
+TODO_ASYNC_VIEWS = os.environ.get('TODO_ASYNC_VIEWS', '') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Configured from DATABASE_URL and friends, see todoapp/db/__init__.py
+
 DATABASES = {
+    'default': database_config(BASE_DIR),
+    **replica_configs(BASE_DIR),
+}
+
+# Read-only pages read from the replicas, everything else from the primary
+# (todo.replicas). After a write the browser stays on the primary for
+# TODO_DB_STICKY_SECONDS. A replica more than TODO_DB_MAX_REPLICA_LAG
+# seconds behind, or unreachable, is skipped; its lag is checked at most
+# every TODO_DB_LAG_CHECK_INTERVAL seconds per process.
+DATABASE_ROUTERS = ['todo.replicas.ReplicaRouter']
+TODO_DB_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# Under test the replicas mirror the test database and reads stay on the
+# primary (todoapp.test_runner)
+TEST_RUNNER = 'todoapp.test_runner.TestRunner'
+TODO_DB_STICKY_SECONDS = int(os.environ.get('TODO_DB_STICKY_SECONDS', 5))
+TODO_DB_MAX_REPLICA_LAG = float(os.environ.get('TODO_DB_MAX_REPLICA_LAG', 2))
+TODO_DB_LAG_CHECK_INTERVAL = float(os.environ.get('TODO_DB_LAG_CHECK_INTERVAL', 1))
+TODO_DB_STICKY_COOKIE = 'todo_primary'
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# "tasks" holds the rendered task list pages (todo.cache). Use the file
+# backend to share it between worker processes on one host.
+
+TASK_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+TASK_CACHE_BACKEND = os.environ.get('TODO_TASK_CACHE', 'locmem')
+# Shared by the worker processes, unlike locmem
+SESSION_CACHE = os.environ.get('TODO_SESSION_CACHE', '')
+if SESSION_CACHE not in ('', 'file'):
+    raise ImproperlyConfigured('TODO_SESSION_CACHE must be "file" or unset')
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'tasks': {
+        'BACKEND': TASK_CACHE_BACKENDS[TASK_CACHE_BACKEND],
+        'LOCATION': str(BASE_DIR / 'cache' / 'tasks') if TASK_CACHE_BACKEND == 'file' else 'todo-tasks',
+        'TIMEOUT': int(os.environ.get('TODO_TASK_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {
+            # Evict a third of the entries once the cache holds this many
+            'MAX_ENTRIES': int(os.environ.get('TODO_TASK_CACHE_MAX_ENTRIES', 1000)),
+            'CULL_FREQUENCY': 3,
+        },
+    },
+    # Rendered task rows and sidebar (todo.fragments), also used by
+    # the {% cache %} tag
+    'template_fragments': {
+        'BACKEND': TASK_CACHE_BACKENDS[TASK_CACHE_BACKEND],
+        'LOCATION': str(BASE_DIR / 'cache' / 'fragments') if TASK_CACHE_BACKEND == 'file' else 'todo-fragments',
+        'TIMEOUT': int(os.environ.get('TODO_FRAGMENT_CACHE_TIMEOUT', 600)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('TODO_FRAGMENT_CACHE_MAX_ENTRIES', 20000)),
+            'CULL_FREQUENCY': 3,
+        },
+    },
+    # Logged-in users with their profile (todo.auth), per process
+    'users': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'todo-users',
+        'TIMEOUT': int(os.environ.get('TODO_USER_CACHE_TTL', 5)),
+    },
+    # Sessions in front of the database for the cached_db engine, only
+    # used when TODO_SESSION_CACHE names a backend the worker processes
+    # share (see SESSION_ENGINE below)
+    'sessions': {
+        'BACKEND': TASK_CACHE_BACKENDS[SESSION_CACHE or 'locmem'],
+        'LOCATION': str(BASE_DIR / 'cache' / 'sessions') if SESSION_CACHE == 'file' else 'todo-sessions',
+        'TIMEOUT': None,
+    },
 }
 
 
+# Sessions
+# https://docs.djangoproject.com/en/4.2/topics/http/sessions/
+# cached_db reads sessions from the "sessions" cache and writes through to
+# the database. It is the default only with a shared session cache
+# (TODO_SESSION_CACHE=file): each process would hold its own copy of a
+# session in locmem, and a logout or password change in one process would
+# leave the session valid in the others until they restart. Without one,
+# sessions are read from the database. signed_cookies keeps them in the
+# cookie, no lookup at all, but a logout cannot revoke a copy of the
+# cookie. Expired database sessions are deleted by manage.py
+# purge_sessions (run it from cron).
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE_NAME = os.environ.get('TODO_SESSION_ENGINE', 'cached_db' if SESSION_CACHE else 'db')
+if SESSION_ENGINE_NAME == 'cached_db' and not SESSION_CACHE:
+    raise ImproperlyConfigured('TODO_SESSION_ENGINE=cached_db needs a shared session cache, '
+                               'set TODO_SESSION_CACHE=file')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_ENGINE_NAME]
+SESSION_CACHE_ALIAS = 'sessions'
+
+# The first one caches users (todo.auth), ModelBackend still resolves the
+# sessions logged in through it
+AUTHENTICATION_BACKENDS = [
+    'todo.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -122,7 +249,33 @@ STATIC_URL = 'static/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
-STATICFILES_DIRS = [BASE_DIR / "static"]
+# Avatars (todo.images): uploads are capped to AVATAR_MAX_SIZE pixels and
+# re-encoded, templates ask for one of the square thumbnail sizes
+AVATAR_MAX_SIZE = 512
+AVATAR_FORMAT = 'WEBP'
+AVATAR_QUALITY = 80
+AVATAR_THUMBNAIL_SIZES = {
+    'small': 64,
+    'medium': 160,
+}
+# manage.py sweep_avatars leaves unreferenced avatars younger than this many
+# seconds alone, an upload of the same bytes may be about to point at them
+AVATAR_SWEEP_GRACE = int(os.environ.get('TODO_AVATAR_SWEEP_GRACE', 3600))
+
+# Bundles built by `manage.py build_assets` (todo.assets) land in
+# ASSETS_ROOT, collectstatic gives them and every other static file a
+# hashed name and .gz/.br siblings in STATIC_ROOT. With TODO_BUNDLE_ASSETS
+# off, pages link the separate source files instead.
+ASSETS_ROOT = BASE_DIR / 'build'
+STATIC_ROOT = os.environ.get('STATIC_ROOT', BASE_DIR / 'staticfiles')
+TODO_BUNDLE_ASSETS = os.environ.get('TODO_BUNDLE_ASSETS', '0' if DEBUG else '1') == '1'
+
+STATICFILES_DIRS = [BASE_DIR / "static", ASSETS_ROOT]
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'todo.storage.CompressedManifestStaticFilesStorage'},
+}
 
 LOGIN_REDIRECT_URL = '/'
 LOGIN_URL = 'login'
@@ -131,3 +284,45 @@ LOGIN_URL = 'login'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Full-text search backend for tasks (todo.search), picked from the
+# database vendor when unset
+# TODO_SEARCH_BACKEND = 'todo.search.ContainsSearch'
+
+# Completed tasks move to the archive table after this many days without a
+# change (todo.archive, manage.py archive_tasks)
+TODO_ARCHIVE_AFTER_DAYS = int(os.environ.get('TODO_ARCHIVE_AFTER_DAYS', 30))
+
+# Request timings (todo.perf): /_perf reports percentiles per URL name over
+# the last PERF_WINDOW_SAMPLES requests of the last PERF_WINDOW_SECONDS.
+# TODO_PERF_LOG=1 writes one JSON line per request to the todo.perf logger.
+PERF_WINDOW_SECONDS = int(os.environ.get('TODO_PERF_WINDOW_SECONDS', 300))
+PERF_WINDOW_SAMPLES = int(os.environ.get('TODO_PERF_WINDOW_SAMPLES', 1000))
+PERF_IGNORE_URL_NAMES = ['perf-stats']
+# /_perf is for staff users only, unless TODO_PERF_STATS_OPEN=1 (a local
+# benchmark run without an admin login)
+PERF_STATS_OPEN = os.environ.get('TODO_PERF_STATS_OPEN', '') == '1'
+
+# Push channel for task changes (todo.events, todo.push), mounted by
+# todoapp/asgi.py. LocalEvents works within one process, PostgresEvents
+# shares events between workers through LISTEN/NOTIFY.
+TODO_PUSH_EVENTS = os.environ.get('TODO_PUSH_EVENTS', '') == '1'
+TODO_EVENTS_BACKEND = os.environ.get('TODO_EVENTS_BACKEND', 'todo.events.LocalEvents')
+TODO_EVENTS_PATH = '/events'
+TODO_EVENTS_HEARTBEAT = int(os.environ.get('TODO_EVENTS_HEARTBEAT', 15))
+TODO_EVENTS_QUEUE_SIZE = 100
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'todo.perf': {
+            'handlers': ['console'],
+            'level': 'INFO' if os.environ.get('TODO_PERF_LOG', '') == '1' else 'WARNING',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,25 @@
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+# Reads stay on the primary under test. The replicas of
+# DATABASE_REPLICA_URLS mirror the test database, and the rows a TestCase
+# writes are never committed, so a replica connection would not see them.
+# The tests of the routing turn it on (todo.tests.ReplicaRoutingTest).
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.primary_reads = override_settings(TODO_DB_REPLICAS=[])
+        self.primary_reads.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.primary_reads.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        # Without DATABASE_REPLICA_URLS, the replica1 the routing tests use
+        # is a second connection to the test database
+        if 'replica1' in kwargs['aliases'] and 'replica1' not in connections.settings:
+            connections.settings['replica1'] = {**connections.settings['default'], 'TEST': {'MIRROR': 'default'}}
+        return super().setup_databases(**kwargs)
@@ -14,10 +14,16 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from todo import assets
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Collected static files with far-future caching, for deployments
+    # without a web server in front (runserver serves them itself in DEBUG)
+    re_path(r'^%s(?P<path>.+)$' % settings.STATIC_URL.lstrip('/'), assets.serve),
     path('', include('todo.urls')),
 ]